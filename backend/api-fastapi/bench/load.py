@@ -0,0 +1,408 @@
+"""
+Benchmark de carga de la API de películas.
+
+Recorre todos los endpoints con httpx, en proceso (transporte ASGI, sin red)
+o contra un servidor levantado con serve.py, e informa rendimiento (req/s) y
+latencias p50/p95/p99. Los resultados se guardan en JSON para comparar entre commits.
+Los escenarios que escriben (create_film, upsert_film) corren sobre una copia
+temporal de --db, así cada corrida parte del mismo catálogo (--in-place lo evita).
+
+Ejemplos:
+    python bench/load.py --rows 100000 --save bench/baselines/asgi-100k.json
+    python bench/load.py --mode server --workers 2 --compare bench/baselines/asgi-100k.json
+    python bench/load.py --url http://localhost:3003 --scenarios films_page,film_by_id
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from bench.dataset import PALABRAS, create_dataset  # noqa: E402
+
+
+class Context:
+    """Datos compartidos por los escenarios: ids existentes y tamaño del catálogo"""
+
+    def __init__(self, ids: List[str], count: int, seed: int):
+        self.ids = ids
+        self.count = count
+        self.rng = random.Random(seed)
+        self.cursors: List[str] = []
+
+
+Scenario = Callable[[httpx.AsyncClient, Context], Awaitable[httpx.Response]]
+
+
+async def films_all(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.get('/films')
+
+
+async def films_page(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.get('/films', params={'limit': 20})
+
+
+async def films_offset_deep(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    offset = ctx.rng.randrange(max(ctx.count - 100, 1))
+    return await client.get('/films', params={'limit': 100, 'offset': offset})
+
+
+async def films_cursor(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    params = {'limit': 100}
+    if ctx.cursors:
+        params['cursor'] = ctx.cursors.pop()
+    response = await client.get('/films', params=params)
+    next_cursor = response.headers.get('x-next-cursor')
+    if next_cursor:
+        ctx.cursors.append(next_cursor)
+    return response
+
+
+async def film_by_id(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.get(f'/films/{ctx.rng.choice(ctx.ids)}')
+
+
+async def search(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    q = ' '.join(ctx.rng.sample(PALABRAS, ctx.rng.randint(1, 2)))
+    return await client.get('/films/search/', params={'q': q, 'limit': 20})
+
+
+async def stats(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.get('/films/stats')
+
+
+async def create_film(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.post('/films', json={
+        'id': f'bench-new-{uuid.uuid4()}',
+        'titulo': 'Película de benchmark',
+        'titulo_original': None,
+        'director': 'Hayao Miyazaki',
+        'productor': 'Toshio Suzuki',
+        'anio_lanzamiento': ctx.rng.randint(1960, 2025),
+        'duracion': ctx.rng.randint(60, 180),
+        'descripcion': 'Creada por bench/load.py',
+        'imagen_url': None,
+        'calificacion': 7.5,
+    })
+
+
+async def upsert_film(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    """POST /films/bulk sobre un id existente: el camino ON CONFLICT DO UPDATE"""
+    response = await client.post('/films/bulk', json=[{
+        'id': ctx.rng.choice(ctx.ids),
+        'titulo': 'Película de benchmark (actualizada)',
+        'titulo_original': None,
+        'director': ctx.rng.choice(['Hayao Miyazaki', 'Isao Takahata', 'Goro Miyazaki']),
+        'productor': 'Toshio Suzuki',
+        'anio_lanzamiento': ctx.rng.randint(1960, 2025),
+        'duracion': ctx.rng.randint(60, 180),
+        'descripcion': 'Actualizada por bench/load.py',
+        'imagen_url': None,
+        'calificacion': 7.5,
+    }])
+    if response.status_code == 200 and response.json()['failed']:
+        # Un 200 con filas rechazadas cuenta como petición fallida
+        return httpx.Response(422, json=response.json(), request=response.request)
+    return response
+
+
+async def health(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.get('/health')
+
+
+# Orden de ejecución: las escrituras al final para no alterar las lecturas
+SCENARIOS: Dict[str, Scenario] = {
+    'films_all': films_all,
+    'films_page': films_page,
+    'films_offset_deep': films_offset_deep,
+    'films_cursor': films_cursor,
+    'film_by_id': film_by_id,
+    'search': search,
+    'stats': stats,
+    'health': health,
+    'create_film': create_film,
+    'upsert_film': upsert_film,
+}
+
+# Escenarios que modifican la base
+WRITE_SCENARIOS = ('create_film', 'upsert_film')
+
+
+def copy_database(source: str, target: str) -> str:
+    """Copiar una base SQLite (incluido lo que siga en el WAL) con la API de backup"""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return target
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: Context,
+    requests: int,
+    concurrency: int,
+    warmup: int
+) -> dict:
+    for _ in range(warmup):
+        await scenario(client, ctx)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, ctx)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    failed = sum(n for status, n in statuses.items() if status >= 400) + sum(errors.values())
+    return {
+        'requests': requests,
+        'failed': failed,
+        'statuses': {str(status): n for status, n in sorted(statuses.items())},
+        'errors': dict(errors),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+async def load_context(client: httpx.AsyncClient, seed: int) -> Context:
+    count = (await client.get('/health')).json()['films_count']
+    response = await client.get('/films', params={'limit': 1000})
+    response.raise_for_status()
+    return Context([film['id'] for film in response.json()], count, seed)
+
+
+async def run_all(client: httpx.AsyncClient, args: argparse.Namespace, names: List[str]) -> Dict[str, dict]:
+    ctx = await load_context(client, args.seed)
+    results = {}
+    for name in names:
+        if name == 'films_all' and ctx.count > args.full_list_max:
+            print(f"  {name:<18} omitido: {ctx.count} películas > --full-list-max {args.full_list_max}")
+            continue
+        result = await run_scenario(client, SCENARIOS[name], ctx, args.requests, args.concurrency, args.warmup)
+        results[name] = result
+        lat = result['latency_ms']
+        print(
+            f"  {name:<18} {result['throughput_rps']:>9.1f} req/s  "
+            f"p50 {lat['p50']:>8.2f} ms  p95 {lat['p95']:>8.2f} ms  p99 {lat['p99']:>8.2f} ms  "
+            f"fallidas {result['failed']}"
+        )
+    return results
+
+
+async def run_asgi(args: argparse.Namespace, names: List[str]) -> Dict[str, dict]:
+    """Ejecutar la app en el mismo proceso, sin red ni servidor"""
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            return await run_all(client, args, names)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """Levantar serve.py en un puerto libre y esperar a que responda /health"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log'],
+        cwd=API_DIR,
+        env=env,
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit(f"uvicorn terminó con código {server.returncode}")
+        try:
+            if httpx.get(f'{url}/health', timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    sys.exit("uvicorn no respondió a tiempo")
+
+
+async def run_http(url: str, args: argparse.Namespace, names: List[str]) -> Dict[str, dict]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        return await run_all(client, args, names)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=API_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Imprimir la diferencia contra una línea base; True si hay regresiones"""
+    print(f"\nComparación con {baseline['meta'].get('commit') or 'línea base'} (umbral {threshold:.0%}):")
+    regressed = False
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        p95_change = (result['latency_ms']['p95'] - base['latency_ms']['p95']) / max(base['latency_ms']['p95'], 1e-9)
+        rps_change = (result['throughput_rps'] - base['throughput_rps']) / max(base['throughput_rps'], 1e-9)
+        flag = p95_change > threshold or rps_change < -threshold
+        regressed = regressed or flag
+        print(
+            f"  {name:<18} req/s {rps_change:+7.1%}  p95 {p95_change:+7.1%}"
+            + ("  <-- REGRESIÓN" if flag else "")
+        )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('asgi', 'server'), default='asgi')
+    parser.add_argument('--url', help="Usar un servidor ya levantado en lugar de crear uno")
+    parser.add_argument('--db', default=os.path.join(API_DIR, 'bench', 'ghibli-bench.db'))
+    parser.add_argument('--rows', type=int, help="Regenerar --db con este número de películas sintéticas")
+    parser.add_argument('--in-place', action='store_true',
+                        help="Ejecutar las escrituras sobre --db en lugar de una copia temporal")
+    parser.add_argument('--workers', type=int, default=1, help="Workers de uvicorn en modo server")
+    parser.add_argument('--requests', type=int, default=500, help="Peticiones por escenario")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--full-list-max', type=int, default=50000,
+                        help="Omitir GET /films sin límite por encima de este tamaño de catálogo")
+    parser.add_argument('--no-cache', action='store_true', help="Desactivar la caché de respuestas")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help="Guardar resultados en este JSON")
+    parser.add_argument('--compare', help="JSON de línea base contra el cual comparar")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Tolerancia de regresión (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    scratch = None
+    if not args.url:
+        if args.rows:
+            print(f"Generando {args.rows} películas en '{args.db}'...")
+            create_dataset(args.db, args.rows)
+        elif not os.path.exists(args.db):
+            sys.exit(f"No existe '{args.db}'; use --rows N para generarla")
+        db_file = os.path.abspath(args.db)
+        if not args.in_place and set(names) & set(WRITE_SCENARIOS):
+            # Sin copia, las altas y upserts se acumulan entre corridas y las
+            # líneas base dejan de ser comparables
+            scratch = tempfile.TemporaryDirectory(prefix='ghibli-bench-')
+            db_file = copy_database(db_file, os.path.join(scratch.name, os.path.basename(db_file)))
+            print(f"Escrituras sobre una copia temporal de '{args.db}'")
+        os.environ['DB_FILE'] = db_file
+        if args.no_cache:
+            os.environ['CACHE_MAX_ENTRIES'] = '0'
+
+    target = args.url or (f"serve.py x{args.workers}" if args.mode == 'server' else 'asgi')
+    print(f"Objetivo: {target}, {args.requests} peticiones por escenario, concurrencia {args.concurrency}")
+
+    try:
+        if args.url:
+            results = asyncio.run(run_http(args.url, args, names))
+        elif args.mode == 'server':
+            server, url = start_server(args, dict(os.environ))
+            try:
+                results = asyncio.run(run_http(url, args, names))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        else:
+            results = asyncio.run(run_asgi(args, names))
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'target': target,
+            'db': None if args.url else os.path.basename(args.db),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'cache': not args.no_cache,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en '{args.save}'")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Verificación de planes de consulta de GET /films.
+
+Ejecuta EXPLAIN QUERY PLAN sobre el SQL que arma queries.films_query para
+cada combinación de filtros (director, productor, años, calificación,
+duración) con cada orden de FILM_SORTS, y con cursor en el orden por
+defecto, y sale con código 1 si alguna:
+
+- recorre la tabla completa sin índice (`SCAN peliculas`),
+- tiene filtros o cursor y no los resuelve buscando en un índice (`SEARCH`), o
+- ordena con un B-tree temporal cuando el índice del orden debería bastar: sin
+  filtros, o filtrando solo por la columna del orden. Pasa, por ejemplo, en una
+  base con los índices de una sola columna del init_db.py original.
+
+Un `SCAN ... USING INDEX` sin filtros es válido: recorre el índice en el orden
+pedido y se detiene en el LIMIT.
+
+Ejemplos:
+    python bench/query_plans.py
+    python bench/query_plans.py --db ghibli.db --verbose
+"""
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from bench.dataset import create_dataset  # noqa: E402
+from queries import DEFAULT_SORT, FILM_SORTS, films_query  # noqa: E402
+
+# Grupos de filtros de /films con valores de ejemplo
+FILTER_GROUPS: Dict[str, Dict[str, object]] = {
+    'director': {'director': 'Hayao Miyazaki'},
+    'producer': {'producer': 'Toshio Suzuki'},
+    'year': {'year_min': 1990, 'year_max': 2005},
+    'rating': {'rating_min': 8.0, 'rating_max': 9.5},
+    'runtime': {'runtime_min': 90, 'runtime_max': 120},
+}
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params: tuple) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+# Grupo de FILTER_GROUPS sobre la columna de cada orden (title no tiene filtro)
+SORT_GROUPS = {'year': 'year', 'title': None, 'rating': 'rating', 'runtime': 'runtime'}
+
+
+def check_plan(plan: List[str], filtered: bool, ordered_by_index: bool) -> List[str]:
+    """Problemas del plan; lista vacía si es correcto"""
+    problems = []
+    if any(line.strip() == 'SCAN peliculas' for line in plan):
+        problems.append("recorre la tabla completa")
+    if filtered and not any(line.startswith('SEARCH peliculas') for line in plan):
+        problems.append("los filtros no usan un índice")
+    if ordered_by_index and any('USE TEMP B-TREE' in line for line in plan):
+        problems.append("ordena con un B-tree temporal en lugar del índice del orden")
+    return problems
+
+
+# Cursor de ejemplo: (anio_lanzamiento, id) de la última fila de una página
+SAMPLE_CURSOR = (2000, '8')
+
+
+def combinations() -> List[Tuple[Tuple[str, ...], str, Optional[tuple]]]:
+    groups = list(FILTER_GROUPS)
+    subsets = [
+        combo for size in range(len(groups) + 1) for combo in itertools.combinations(groups, size)
+    ]
+    cases = [(combo, sort, None) for combo in subsets for sort in FILM_SORTS]
+    cases += [(combo, DEFAULT_SORT, SAMPLE_CURSOR) for combo in subsets]
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help="Base a revisar (por defecto, una sintética temporal)")
+    parser.add_argument('--rows', type=int, default=20000, help="Películas de la base sintética")
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--verbose', action='store_true', help="Mostrar el plan de cada combinación")
+    args = parser.parse_args()
+
+    tmp = None
+    db_file = args.db
+    if not db_file:
+        tmp = tempfile.TemporaryDirectory()
+        db_file = os.path.join(tmp.name, 'plans.db')
+        create_dataset(db_file, args.rows)
+
+    conn = sqlite3.connect(db_file)
+    failures = 0
+    try:
+        cases = combinations()
+        for groups, sort, after in cases:
+            filters: Dict[str, object] = {}
+            for group in groups:
+                filters.update(FILTER_GROUPS[group])
+            sql, params = films_query(args.limit, None, after, filters, sort)
+            plan = query_plan(conn, sql, params)
+            ordered_by_index = set(groups) <= {SORT_GROUPS[sort.lstrip('-')]}
+            problems = check_plan(plan, bool(filters) or after is not None, ordered_by_index)
+            failures += bool(problems)
+            label = f"{'+'.join(groups) or 'sin filtros':<40} sort={sort:<9}{' cursor' if after else '':<7}"
+            if problems or args.verbose:
+                print(f"{'FALLA' if problems else 'ok':<6}{label} {' | '.join(plan)}")
+                for problem in problems:
+                    print(f"      -> {problem}")
+        print(f"\n{len(cases) - failures} de {len(cases)} combinaciones con un plan correcto")
+    finally:
+        conn.close()
+        if tmp:
+            tmp.cleanup()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
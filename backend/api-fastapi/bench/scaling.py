@@ -0,0 +1,169 @@
+"""
+Escalado multi-proceso de la API de películas.
+
+Levanta serve.py con 1, 2, ... N workers sobre la misma base y, para cada
+cantidad, ejecuta lecturas y escrituras (POST /films) al mismo tiempo. Informa
+el rendimiento de lecturas y escrituras, la aceleración respecto de 1 worker y
+los errores por lock de SQLite (503 o "database is locked"). Sale con código 1
+si hubo alguno. Cada cantidad de workers corre sobre una copia temporal de --db,
+así todas parten del mismo catálogo (--in-place lo evita).
+
+Ejemplos:
+    python bench/scaling.py --rows 100000
+    python bench/scaling.py --workers 1,2,4,8 --writers 8 --no-cache
+    python bench/scaling.py --read-scenarios film_by_id,search
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import httpx
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from bench.dataset import create_dataset  # noqa: E402
+from bench.load import (  # noqa: E402
+    SCENARIOS, copy_database, create_film, git_commit, load_context, run_scenario, start_server
+)
+
+READ_SCENARIOS = 'film_by_id,films_page,films_cursor'
+
+
+def default_worker_counts() -> str:
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    counts.append(os.cpu_count() or 1)
+    return ','.join(str(c) for c in counts)
+
+
+def lock_errors(result: dict) -> int:
+    return result['statuses'].get('503', 0) + result.get('locked', 0)
+
+
+async def run_mixed(url: str, args: argparse.Namespace) -> Dict[str, dict]:
+    """Lecturas y escrituras en paralelo contra el mismo servidor"""
+    limits = httpx.Limits(max_connections=args.readers + args.writers)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        ctx = await load_context(client, args.seed)
+        locked = 0
+
+        async def write(client: httpx.AsyncClient, ctx) -> httpx.Response:
+            nonlocal locked
+            response = await create_film(client, ctx)
+            if response.status_code == 500 and 'locked' in response.text:
+                locked += 1
+            return response
+
+        names = args.read_scenarios
+        readers = [
+            run_scenario(client, SCENARIOS[name], ctx, args.requests, max(args.readers // len(names), 1), args.warmup)
+            for name in names
+        ]
+        writers = run_scenario(client, write, ctx, args.write_requests, args.writers, 0)
+        start = time.perf_counter()
+        *read_results, write_result = await asyncio.gather(*readers, writers)
+        elapsed = time.perf_counter() - start
+
+    write_result['locked'] = locked
+    reads = sum(r['requests'] for r in read_results)
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'read_rps': round(reads / elapsed, 1),
+        'write_rps': write_result['throughput_rps'],
+        'reads': dict(zip(names, read_results)),
+        'writes': write_result,
+        'lock_errors': lock_errors(write_result) + sum(lock_errors(r) for r in read_results),
+        'failed': write_result['failed'] + sum(r['failed'] for r in read_results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.path.join(API_DIR, 'bench', 'ghibli-bench.db'))
+    parser.add_argument('--rows', type=int, help="Regenerar --db con este número de películas sintéticas")
+    parser.add_argument('--in-place', action='store_true',
+                        help="Ejecutar las escrituras sobre --db en lugar de una copia temporal")
+    parser.add_argument('--workers', default=default_worker_counts(),
+                        help="Cantidades de workers a probar, separadas por coma")
+    parser.add_argument('--read-scenarios', default=READ_SCENARIOS, help="Escenarios de bench/load.py para las lecturas")
+    parser.add_argument('--requests', type=int, default=1000, help="Lecturas por escenario de lectura")
+    parser.add_argument('--write-requests', type=int, default=200, help="Escrituras totales")
+    parser.add_argument('--readers', type=int, default=24, help="Lecturas concurrentes")
+    parser.add_argument('--writers', type=int, default=8, help="Escrituras concurrentes")
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--no-cache', action='store_true', help="Desactivar la caché de respuestas")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help="Guardar resultados en este JSON")
+    args = parser.parse_args()
+
+    args.read_scenarios = [name.strip() for name in args.read_scenarios.split(',') if name.strip()]
+    unknown = set(args.read_scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    if args.rows:
+        print(f"Generando {args.rows} películas en '{args.db}'...")
+        create_dataset(args.db, args.rows)
+    elif not os.path.exists(args.db):
+        sys.exit(f"No existe '{args.db}'; use --rows N para generarla")
+
+    env = dict(os.environ, DB_FILE=os.path.abspath(args.db))
+    if args.no_cache:
+        env['CACHE_MAX_ENTRIES'] = '0'
+
+    counts = [int(n) for n in args.workers.split(',') if n.strip()]
+    print(f"Workers {counts}, {args.readers} lectores y {args.writers} escritores concurrentes, "
+          f"{os.cpu_count()} CPUs")
+    results: Dict[int, dict] = {}
+    for workers in counts:
+        args.workers = workers
+        with tempfile.TemporaryDirectory(prefix='ghibli-bench-') as scratch:
+            if not args.in_place:
+                target = os.path.join(scratch, os.path.basename(args.db))
+                env['DB_FILE'] = copy_database(os.path.abspath(args.db), target)
+            server, url = start_server(args, env)
+            try:
+                result = asyncio.run(run_mixed(url, args))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        results[workers] = result
+        base = results[counts[0]]['read_rps']
+        print(
+            f"  {workers:>3} workers  lecturas {result['read_rps']:>9.1f} req/s (x{result['read_rps'] / base:.2f})  "
+            f"escrituras {result['write_rps']:>7.1f} req/s  "
+            f"p95 escritura {result['writes']['latency_ms']['p95']:>8.2f} ms  "
+            f"errores de lock {result['lock_errors']}  fallidas {result['failed']}"
+        )
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'commit': git_commit(),
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    'db': os.path.basename(args.db),
+                    'cpus': os.cpu_count(),
+                    'cache': not args.no_cache,
+                },
+                'results': {str(workers): result for workers, result in results.items()},
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en '{args.save}'")
+
+    total_lock_errors = sum(result['lock_errors'] for result in results.values())
+    if total_lock_errors:
+        print(f"\n{total_lock_errors} errores de lock")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
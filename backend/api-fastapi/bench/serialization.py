@@ -0,0 +1,137 @@
+"""
+Microbenchmark de serialización de GET /films.
+
+Compara el camino anterior (filas sqlite3.Row -> format_pelicula() -> validación
+con List[PeliculaResponse] -> jsonable_encoder -> JSONResponse) con el actual
+(json_object() en SQLite unido en un arreglo), verificando que ambos producen
+exactamente los mismos bytes.
+
+Uso: python bench/serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from init_db import SQL_SCHEMA  # noqa: E402
+from models import PeliculaResponse  # noqa: E402
+from queries import fetch_films, json_array  # noqa: E402
+
+LEGACY_COLUMNS = """
+    id, titulo, titulo_original, director, productor,
+    anio_lanzamiento, duracion, descripcion, imagen_url, calificacion
+"""
+
+
+def format_pelicula(row: sqlite3.Row) -> dict:
+    """Implementación original, conservada como referencia"""
+    return {
+        "id": row['id'],
+        "title": row['titulo'],
+        "original_title": row['titulo_original'] or row['titulo'],
+        "director": row['director'],
+        "producer": row['productor'] or '',
+        "release_date": str(row['anio_lanzamiento']),
+        "running_time": str(row['duracion']),
+        "description": row['descripcion'],
+        "image": row['imagen_url'] or '',
+        "rt_score": str(int(row['calificacion'] * 10)) if row['calificacion'] else '0'
+    }
+
+
+RESPONSE_ADAPTER = TypeAdapter(List[PeliculaResponse])
+
+
+def legacy_body(conn: sqlite3.Connection) -> bytes:
+    rows = conn.execute(f"""
+        SELECT {LEGACY_COLUMNS}
+        FROM peliculas
+        ORDER BY anio_lanzamiento DESC, id DESC
+    """).fetchall()
+    content = [format_pelicula(row) for row in rows]
+    # Lo que FastAPI hace con response_model antes de responder
+    validated = RESPONSE_ADAPTER.validate_python(content)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_body(conn: sqlite3.Connection) -> bytes:
+    return json_array(row[2] for row in fetch_films(conn, None))
+
+
+SAMPLE_TEXTS = [
+    'El Castillo en el Cielo', 'Tenkū no Shiro Rapyuta', 'Ñandú "comillas" \\ barra',
+    'Línea\nnueva\ty tab', 'Emoji 🎬 y control \x01', 'Mononoke-hime', ''
+]
+
+
+def build_database(path: str, rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SQL_SCHEMA)
+    conn.executemany(
+        """
+        INSERT INTO peliculas (id, titulo, titulo_original, director, productor,
+                               anio_lanzamiento, duracion, descripcion, imagen_url, calificacion)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                f'film-{i:07d}',
+                SAMPLE_TEXTS[i % 6] + f' {i}',
+                SAMPLE_TEXTS[i % 7] or None if i % 3 else '',
+                'Hayao Miyazaki',
+                None if i % 4 == 0 else 'Toshio Suzuki',
+                1960 + i % 65,
+                60 + i % 120,
+                SAMPLE_TEXTS[(i + 2) % 6] * 4,
+                None if i % 5 == 0 else f'https://example.org/{i}.jpg',
+                None if i % 9 == 0 else (i % 101) / 10,
+            )
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    return conn
+
+
+def timeit(fn, conn, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(conn)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', default=':memory:', help="Ruta de la base temporal (por defecto en memoria)")
+    args = parser.parse_args()
+
+    conn = build_database(args.db, args.rows)
+
+    legacy, fast = legacy_body(conn), fast_body(conn)
+    if legacy != fast:
+        sys.exit("ERROR: las respuestas no son idénticas byte a byte")
+
+    legacy_ms = statistics.median(timeit(legacy_body, conn, args.repeat))
+    fast_ms = statistics.median(timeit(fast_body, conn, args.repeat))
+    print(f"{args.rows} filas, {len(fast)} bytes, respuestas idénticas")
+    print(f"  anterior (format_pelicula + validación + JSONResponse): {legacy_ms:9.2f} ms")
+    print(f"  actual   (json_object en SQLite):                      {fast_ms:9.2f} ms")
+    print(f"  aceleración: {legacy_ms / fast_ms:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Consistencia de GET /films/stats con los triggers de resumen.
+
+Sobre una base sintética, ejecuta en proceso (transporte ASGI) las escrituras
+de la API que disparan los triggers de peliculas: altas con POST /films y
+upserts con POST /films/bulk que actualizan ids existentes (cambiando director,
+década, duración y calificación, con calificación NULL, sin cambios y con
+directores nuevos).
+Después compara la respuesta de /films/stats con los resúmenes recalculados
+desde cero con SQL_STATS_REBUILD y sale con código 1 si difieren o si alguna
+escritura falló.
+
+Ejemplos:
+    python bench/stats_consistency.py
+    python bench/stats_consistency.py --rows 20000 --upserts 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import uuid
+from typing import Any, List
+
+import httpx
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+from bench.dataset import create_dataset  # noqa: E402
+
+# Los promedios se redondean a 2 decimales: sumar de a una fila o de una vez
+# puede diferir en el último dígito
+AVERAGE_TOLERANCE = 0.011
+
+
+def differences(path: str, actual: Any, expected: Any) -> List[str]:
+    """Diferencias entre dos respuestas de /films/stats"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        found = []
+        for key in sorted(set(expected) | set(actual)):
+            found += differences(f'{path}.{key}', actual.get(key), expected.get(key))
+        return found
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(actual) != len(expected):
+            return [f'{path}: {len(actual)} elementos, se esperaban {len(expected)}']
+        return [d for i, (a, e) in enumerate(zip(actual, expected)) for d in differences(f'{path}[{i}]', a, e)]
+    if isinstance(expected, float) and isinstance(actual, (int, float)):
+        return [] if abs(actual - expected) <= AVERAGE_TOLERANCE else [f'{path}: {actual} != {expected}']
+    return [] if actual == expected else [f'{path}: {actual!r} != {expected!r}']
+
+
+def film(film_id: str, rng: random.Random, **changes) -> dict:
+    values = {
+        'id': film_id,
+        'titulo': f'Película {film_id}',
+        'titulo_original': None,
+        'director': rng.choice(['Hayao Miyazaki', 'Isao Takahata', 'HAYAO MIYAZAKI', '']),
+        'productor': 'Toshio Suzuki',
+        'anio_lanzamiento': rng.randint(1950, 2025),
+        'duracion': rng.randint(40, 200),
+        'descripcion': 'Creada por bench/stats_consistency.py',
+        'imagen_url': None,
+        'calificacion': rng.choice([round(rng.uniform(0, 10), 1), None]),
+    }
+    values.update(changes)
+    return values
+
+
+async def run_writes(client: httpx.AsyncClient, args: argparse.Namespace) -> List[str]:
+    rng = random.Random(args.seed)
+    ids = [f['id'] for f in (await client.get('/films', params={'limit': args.rows})).json()]
+    problems = []
+
+    for _ in range(args.inserts):
+        response = await client.post('/films', json=film(f'nueva-{uuid.uuid4()}', rng))
+        if response.status_code != 200:
+            problems.append(f'POST /films: {response.status_code} {response.text}')
+
+    changed = [film(rng.choice(ids), rng) for _ in range(args.upserts)]
+    batches = [
+        # Ids existentes con valores nuevos, y con directores que no existían
+        changed,
+        [film(rng.choice(ids), rng, director=f'Director {uuid.uuid4().hex[:8]}') for _ in range(10)],
+        # El mismo id varias veces en un lote, y un alta mezclada con upserts
+        [film(ids[0], rng) for _ in range(5)] + [film(f'nueva-{uuid.uuid4()}', rng)],
+        # Upserts que no cambian ninguna columna de los resúmenes
+        changed[:10],
+    ]
+    for batch in batches:
+        args.written += len(batch)
+        response = await client.post('/films/bulk', json=batch)
+        report = response.json()
+        if response.status_code != 200 or report['failed']:
+            problems.append(f'POST /films/bulk: {response.status_code} {report}')
+    return problems
+
+
+async def check(args: argparse.Namespace) -> List[str]:
+    import main
+    from init_db import SQL_STATS_REBUILD
+    from queries import fetch_stats
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            problems = await run_writes(client, args)
+            actual = (await client.get('/films/stats')).json()
+
+    conn = sqlite3.connect(os.environ['DB_FILE'])
+    try:
+        conn.executescript(SQL_STATS_REBUILD)
+        expected = fetch_stats(conn)
+    finally:
+        conn.close()
+    return problems + differences('stats', actual, expected)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000, help="Películas de la base sintética")
+    parser.add_argument('--inserts', type=int, default=50, help="Altas con POST /films")
+    parser.add_argument('--upserts', type=int, default=500, help="Ids existentes actualizados con POST /films/bulk")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    args.written = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'stats.db')
+        create_dataset(db_file, args.rows)
+        os.environ['DB_FILE'] = db_file
+        problems = asyncio.run(check(args))
+
+    for problem in problems:
+        print(f"FALLA {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"/films/stats coincide con SQL_STATS_REBUILD tras {args.inserts} altas y {args.written} filas de /films/bulk")
+
+
+if __name__ == '__main__':
+    main()
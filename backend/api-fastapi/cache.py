@@ -0,0 +1,142 @@
+"""
+Caché en memoria (LRU + TTL) de respuestas JSON ya serializadas, con ETag
+fuerte y Last-Modified para responder GET condicionales sin tocar la base.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+
+def make_etag(body: bytes) -> str:
+    """ETag fuerte derivado del contenido exacto de la respuesta"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def http_date(sqlite_timestamp: Optional[str]) -> Optional[str]:
+    """Convertir un CURRENT_TIMESTAMP de SQLite (UTC) a fecha HTTP"""
+    if not sqlite_timestamp:
+        return None
+    try:
+        dt = datetime.strptime(sqlite_timestamp, '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+    return format_datetime(dt.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'last_modified', 'headers', 'expires')
+
+    def __init__(self, body: bytes, last_modified: Optional[str], headers: Dict[str, str], expires: float):
+        self.body = body
+        self.etag = make_etag(body)
+        self.last_modified = last_modified
+        self.headers = headers
+        self.expires = expires
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Evaluar las precondiciones de un GET condicional (RFC 9110)"""
+        if if_none_match is not None:
+            if if_none_match.strip() == '*':
+                return True
+            tags = (tag.strip() for tag in if_none_match.split(','))
+            return any((tag[2:] if tag.startswith('W/') else tag) == self.etag for tag in tags)
+        if if_modified_since and self.last_modified:
+            try:
+                return parsedate_to_datetime(self.last_modified) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class ResponseCache:
+    """LRU acotado por entradas y por bytes, con expiración por TTL; seguro entre hilos"""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 60.0, max_bytes: int = 128 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Suma de los cuerpos guardados
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Cambia en cada invalidación: descarta respuestas calculadas antes de una escritura
+        self.generation = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        last_modified: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        generation: Optional[int] = None
+    ) -> CachedResponse:
+        entry = CachedResponse(body, last_modified, headers or {}, time.monotonic() + self.ttl)
+        # Una respuesta más grande que toda la caché se sirve sin guardarla
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.bytes += len(body)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def _remove(self, key: str) -> None:
+        """Quitar una entrada; requiere tener el lock"""
+        self.bytes -= len(self._entries.pop(key).body)
+
+    def invalidate(self, prefix: str = '') -> int:
+        """Eliminar las entradas cuya clave empieza con prefix (todas si es vacío)"""
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+            self.generation += 1
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,281 @@
+"""
+Compresión de respuestas negociada con Accept-Encoding: brotli (si está
+instalado el paquete `brotli`) o gzip, a partir de un tamaño mínimo.
+
+La versión comprimida es otra representación del recurso, así que su ETag
+lleva el sufijo de la codificación ("…-gzip"); el sufijo se quita de
+If-None-Match antes de llegar a la app para que los 304 sigan funcionando.
+Las respuestas con ETag guardan su cuerpo comprimido: un /films en caché no
+se vuelve a comprimir en cada petición.
+"""
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# En orden de preferencia cuando el cliente acepta varias con el mismo q
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+
+# Cuerpos más grandes se comprimen en un hilo de trabajo para no frenar el event loop
+THREADPOOL_SIZE = 256 * 1024
+
+ETAG_SUFFIX = re.compile(r'-(?:br|gzip)"')
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Codificación disponible con mayor q en Accept-Encoding, o None"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES or media_type.endswith('+json')
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag de la representación comprimida: '"abc"' -> '"abc-gzip"'"""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+class CompressionStats:
+    """Contadores compartidos por las instancias del middleware"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.memo_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, bytes_in: int, bytes_out: int) -> None:
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def memo_hit(self) -> None:
+        with self._lock:
+            self.memo_hits += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "encodings": list(ENCODINGS),
+                "compressed": self.compressed,
+                "memo_hits": self.memo_hits,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            }
+
+
+compression_stats = CompressionStats()
+
+
+class StreamCompressor:
+    """Compresión incremental: cada fragmento sale completo (sync flush)"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31: formato gzip (encabezado y CRC)
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Middleware ASGI de compresión negociada con umbral de tamaño y Vary"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        memo_entries: int = 32,
+        memo_max_bytes: int = 32 * 1024 * 1024
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.memo_entries = memo_entries
+        self.memo_max_bytes = memo_max_bytes
+        # (etag, codificación) -> cuerpo comprimido; el ETag fuerte identifica el contenido
+        self._memo: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._memo_bytes = 0
+        self._lock = threading.Lock()
+
+    def compress_body(self, encoding: str, body: bytes) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+
+    async def compressed(self, encoding: str, body: bytes, etag: Optional[str]) -> bytes:
+        key = (etag, encoding) if etag and not etag.startswith('W/') else None
+        if key is not None:
+            with self._lock:
+                cached = self._memo.get(key)
+                if cached is not None:
+                    self._memo.move_to_end(key)
+                    compression_stats.memo_hit()
+                    return cached
+        if len(body) >= THREADPOOL_SIZE:
+            data = await run_in_threadpool(self.compress_body, encoding, body)
+        else:
+            data = self.compress_body(encoding, body)
+        # Un cuerpo más grande que el límite no se guarda: vaciaría el memo entero
+        if key is not None and self.memo_entries and len(data) <= self.memo_max_bytes:
+            with self._lock:
+                previous = self._memo.pop(key, None)
+                if previous is not None:
+                    self._memo_bytes -= len(previous)
+                self._memo[key] = data
+                self._memo_bytes += len(data)
+                while len(self._memo) > self.memo_entries or self._memo_bytes > self.memo_max_bytes:
+                    _, evicted = self._memo.popitem(last=False)
+                    self._memo_bytes -= len(evicted)
+        return data
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate(request_headers.get('accept-encoding', ''))
+        if_none_match = request_headers.get('if-none-match')
+        if if_none_match and ETAG_SUFFIX.search(if_none_match):
+            # La app solo conoce el ETag sin comprimir. Se cambia el scope en su
+            # lugar: MetricsMiddleware lee del mismo dict el endpoint que fija el router
+            scope['headers'] = [
+                (name, ETAG_SUFFIX.sub('"', value.decode('latin-1')).encode('latin-1'))
+                if name == b'if-none-match' else (name, value)
+                for name, value in scope['headers']
+            ]
+
+        start_message: dict = {}
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+        bytes_in = bytes_out = 0
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough, bytes_in, bytes_out
+            if message['type'] == 'http.response.start':
+                # Se retiene hasta ver el primer fragmento del cuerpo
+                start_message = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            if compressor is not None:
+                body = message.get('body', b'')
+                more_body = message.get('more_body', False)
+                data = compressor.compress(body) if body else b''
+                if not more_body:
+                    data += compressor.finish()
+                bytes_in += len(body)
+                bytes_out += len(data)
+                if not more_body:
+                    compression_stats.record(bytes_in, bytes_out)
+                await send({**message, 'body': data})
+                return
+
+            # Primer fragmento del cuerpo: decidir si se comprime
+            headers = MutableHeaders(raw=list(start_message.get('headers', [])))
+            start_message = {**start_message, 'headers': headers.raw}
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            status = start_message['status']
+            compressible = (
+                status not in (204, 206, 304)
+                and 'content-encoding' not in headers
+                and is_compressible(headers.get('content-type', ''))
+            )
+            if status == 304 and encoding and 'etag' in headers and if_none_match:
+                # Devolver el ETag de la representación que el cliente ya tiene
+                tagged = encoded_etag(headers['etag'], encoding)
+                if tagged in if_none_match:
+                    headers['etag'] = tagged
+            # Un 304 confirma una representación que pudo ir comprimida: los
+            # cachés intermedios también necesitan saber que depende de Accept-Encoding
+            if compressible or status == 304:
+                headers.add_vary_header('Accept-Encoding')
+            if not compressible or encoding is None or (not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers['content-encoding'] = encoding
+            if 'etag' in headers:
+                etag = headers['etag']
+                headers['etag'] = encoded_etag(etag, encoding)
+            else:
+                etag = None
+            if not more_body:
+                data = await self.compressed(encoding, body, etag)
+                headers['content-length'] = str(len(data))
+                compression_stats.record(len(body), len(data))
+                await send(start_message)
+                await send({**message, 'body': data})
+                return
+
+            # Streaming: sin Content-Length, cada fragmento se comprime al llegar
+            del headers['content-length']
+            compressor = StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+            data = compressor.compress(body) if body else b''
+            bytes_in, bytes_out = len(body), len(data)
+            await send(start_message)
+            await send({**message, 'body': data})
+
+        await self.app(scope, receive, send_wrapper)
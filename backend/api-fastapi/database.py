@@ -0,0 +1,288 @@
+"""
+Capa de acceso a SQLite: pool acotado de conexiones de larga vida y
+ejecución de consultas en hilos de trabajo para no bloquear el event loop.
+
+Las escrituras pasan por ConnectionPool.write: una a la vez por proceso,
+con BEGIN IMMEDIATE y reintentos con backoff cuando otro proceso (otro
+worker de uvicorn) tiene el lock de escritura.
+"""
+import asyncio
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+# Ajustes aplicados a cada conexión al abrirla
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MiB
+    "PRAGMA cache_size=-16000",     # ~16 MiB de caché de páginas
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+
+class DatabaseBusy(Exception):
+    """Otro escritor mantuvo el lock de la base tras agotar los reintentos"""
+
+
+def is_lock_error(error: Exception) -> bool:
+    """SQLITE_BUSY / SQLITE_LOCKED: otra conexión tiene el lock que se necesita"""
+    return isinstance(error, sqlite3.OperationalError) and (
+        'locked' in str(error) or 'busy' in str(error)
+    )
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite reutilizables entre hilos"""
+
+    def __init__(
+        self,
+        db_file: str,
+        size: int = 4,
+        timeout: float = 5.0,
+        observer: Optional[Callable[[str, float, Any], None]] = None,
+        write_retries: int = 3,
+        write_backoff: float = 0.05
+    ):
+        self.db_file = db_file
+        self.size = size
+        self.timeout = timeout
+        self.write_retries = write_retries
+        self.write_backoff = write_backoff
+        # observer(nombre, segundos, resultado) se llama en el event loop tras cada consulta
+        self.observer = observer
+        # LIFO: la conexión usada más recientemente tiene la caché más caliente
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._checkout_total = 0.0
+        self._checkout_max = 0.0
+        # Cola de escritores del proceso; se crea dentro del event loop
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._writes = 0
+        self._write_retries = 0
+        self._busy_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva con los PRAGMA de rendimiento"""
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Obtener una conexión del pool, abriendo una nueva si hay cupo"""
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                if can_open:
+                    self._opened += 1
+                else:
+                    self._waiters += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Sin conexiones libres tras {self.timeout}s (pool de {self.size})"
+                    )
+                finally:
+                    with self._lock:
+                        self._waiters -= 1
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._checkout_total += elapsed
+            self._checkout_max = max(self._checkout_max, elapsed)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Devolver una conexión al pool descartando transacciones abiertas"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> Tuple[T, float]:
+        with self.connection() as conn:
+            start = time.perf_counter()
+            result = fn(conn, *args)
+            return result, time.perf_counter() - start
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Ejecutar fn(conn, *args) en un hilo de trabajo con una conexión del pool"""
+        result, elapsed = await run_in_threadpool(self._run, fn, *args)
+        if self.observer is not None:
+            self.observer(fn.__name__, elapsed, result)
+        return result
+
+    def _begin_immediate(self, conn: sqlite3.Connection) -> None:
+        """Tomar el lock de escritura al iniciar la transacción, con reintentos.
+
+        En una transacción diferida que primero lee y luego escribe, SQLite
+        devuelve SQLITE_BUSY sin esperar busy_timeout si otro proceso escribió
+        entre medio; con BEGIN IMMEDIATE la espera ocurre aquí y es reintentable.
+        """
+        delay = self.write_backoff
+        for attempt in range(self.write_retries + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                if attempt == self.write_retries:
+                    with self._lock:
+                        self._busy_errors += 1
+                    raise DatabaseBusy(
+                        f"La base sigue bloqueada tras {self.write_retries + 1} intentos"
+                    ) from e
+                with self._lock:
+                    self._write_retries += 1
+                # Backoff exponencial con jitter para no reintentar todos a la vez
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, 1.0)
+
+    def _write(self, fn: Callable[..., T], *args: Any) -> Tuple[T, float]:
+        with self.connection() as conn:
+            self._begin_immediate(conn)
+            start = time.perf_counter()
+            try:
+                result = fn(conn, *args)
+                if conn.in_transaction:
+                    conn.commit()
+            except sqlite3.OperationalError as e:
+                if is_lock_error(e):
+                    with self._lock:
+                        self._busy_errors += 1
+                    raise DatabaseBusy(str(e)) from e
+                raise
+            with self._lock:
+                self._writes += 1
+            return result, time.perf_counter() - start
+
+    async def write(self, fn: Callable[..., T], *args: Any) -> T:
+        """Ejecutar la escritura fn(conn, *args) dentro de una transacción IMMEDIATE.
+
+        Las escrituras del proceso esperan su turno en el event loop, sin ocupar
+        hilos ni conexiones; fn puede confirmar por su cuenta o dejar que se
+        confirme al terminar.
+        """
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        async with self._write_lock:
+            result, elapsed = await run_in_threadpool(self._write, fn, *args)
+        if self.observer is not None:
+            self.observer(fn.__name__, elapsed, result)
+        return result
+
+    def close(self) -> None:
+        """Cerrar las conexiones inactivas del pool"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def metrics(self) -> dict:
+        """Estado del pool para /health"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "avg_checkout_ms": round(self._checkout_total / self._checkouts * 1000, 3)
+                if self._checkouts else 0.0,
+                "max_checkout_ms": round(self._checkout_max * 1000, 3),
+                "writes": self._writes,
+                "write_retries": self._write_retries,
+                "busy_errors": self._busy_errors,
+            }
+
+
+class ChangeWatcher:
+    """Detecta escrituras confirmadas en la base por otras conexiones o procesos.
+
+    PRAGMA data_version cambia cuando otra conexión confirma una escritura; el
+    mtime del archivo cubre el caso de que se reemplace la base completa.
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last: Optional[Tuple[int, int]] = None
+
+    def signature(self) -> Tuple[int, int]:
+        """(data_version, mtime) vistos desde la conexión propia del observador"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            try:
+                mtime = os.stat(self.db_file).st_mtime_ns
+            except OSError:
+                mtime = 0
+            return self._conn.execute("PRAGMA data_version").fetchone()[0], mtime
+
+    def changed(self) -> bool:
+        """True si la base cambió desde la llamada anterior"""
+        signature = self.signature()
+        changed = self._last is not None and signature != self._last
+        self._last = signature
+        return changed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,10 +1,20 @@
+import argparse
+import csv
+import json
 import sqlite3
 import os
 
-DB_FILE = './ghibli.db'
+from queries import RUNTIME_BUCKET
 
-SQL_INIT = """
+DB_FILE = os.getenv('DB_FILE', './ghibli.db')
+
+SQL_SCHEMA = """
+DROP TABLE IF EXISTS peliculas_fts;
 DROP TABLE IF EXISTS peliculas;
+DROP TABLE IF EXISTS peliculas_stats;
+DROP TABLE IF EXISTS peliculas_stats_director;
+DROP TABLE IF EXISTS peliculas_stats_decada;
+DROP TABLE IF EXISTS peliculas_stats_duracion;
 DROP TABLE IF EXISTS idx_peliculas_titulo;
 DROP TABLE IF EXISTS idx_peliculas_anio;
 
@@ -19,9 +29,272 @@ CREATE TABLE peliculas (
     descripcion TEXT,
     imagen_url TEXT,
     calificacion REAL,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    -- Última escritura de la fila (alta o upsert); de aquí sale Last-Modified
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+SQL_FTS = """
+-- Índice de texto completo sobre peliculas (contenido externo, sin duplicar datos).
+-- unicode61 con remove_diacritics pliega acentos y macrones: "tenku" encuentra "Tenkū".
+-- Se enlaza por rowid; tras un VACUUM ejecutar:
+--   INSERT INTO peliculas_fts(peliculas_fts) VALUES('rebuild');
+CREATE VIRTUAL TABLE IF NOT EXISTS peliculas_fts USING fts5(
+    titulo, titulo_original, director, productor, descripcion,
+    content='peliculas',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS peliculas_fts_ai AFTER INSERT ON peliculas BEGIN
+    INSERT INTO peliculas_fts(rowid, titulo, titulo_original, director, productor, descripcion)
+    VALUES (new.rowid, new.titulo, new.titulo_original, new.director, new.productor, new.descripcion);
+END;
+
+CREATE TRIGGER IF NOT EXISTS peliculas_fts_ad AFTER DELETE ON peliculas BEGIN
+    INSERT INTO peliculas_fts(peliculas_fts, rowid, titulo, titulo_original, director, productor, descripcion)
+    VALUES ('delete', old.rowid, old.titulo, old.titulo_original, old.director, old.productor, old.descripcion);
+END;
+
+CREATE TRIGGER IF NOT EXISTS peliculas_fts_au AFTER UPDATE ON peliculas BEGIN
+    INSERT INTO peliculas_fts(peliculas_fts, rowid, titulo, titulo_original, director, productor, descripcion)
+    VALUES ('delete', old.rowid, old.titulo, old.titulo_original, old.director, old.productor, old.descripcion);
+    INSERT INTO peliculas_fts(rowid, titulo, titulo_original, director, productor, descripcion)
+    VALUES (new.rowid, new.titulo, new.titulo_original, new.director, new.productor, new.descripcion);
+END;
+"""
+
+# Índices de los listados de /films (ver FILM_FILTERS y FILM_SORTS en queries.py).
+# Todos terminan en id para resolver también el desempate del ORDER BY; los de
+# director y productor siguen con el año para filtrar y ordenar con el mismo índice.
+# En bases existentes se aplican con ensure_indexes() (serve.py, --load).
+INDEXES = {
+    'idx_peliculas_titulo': "peliculas(titulo, id)",
+    'idx_peliculas_anio': "peliculas(anio_lanzamiento, id)",
+    'idx_peliculas_updated': "peliculas(updated_at)",
+    'idx_peliculas_director': "peliculas(director COLLATE NOCASE, anio_lanzamiento, id)",
+    'idx_peliculas_productor': "peliculas(productor COLLATE NOCASE, anio_lanzamiento, id)",
+    'idx_peliculas_calificacion': "peliculas(calificacion, id)",
+    'idx_peliculas_duracion': "peliculas(duracion, id)",
+}
+
+# Índices de versiones anteriores que ya no usa ninguna consulta
+OBSOLETE_INDEXES = ('idx_peliculas_created',)
+
+SQL_INDEXES = ''.join(f"CREATE INDEX IF NOT EXISTS {name} ON {columns};\n" for name, columns in INDEXES.items())
+
+def stats_delta(row, sign):
+    """Sentencias que suman (sign='+') o restan ('-') la fila new/old en los resúmenes.
+
+    Las filas de resumen faltantes se crean con INSERT ... WHERE NOT EXISTS y no
+    con INSERT OR IGNORE: dentro de un trigger, el ON CONFLICT de la sentencia
+    externa (el upsert de loader.py) reemplaza al OR IGNORE y el INSERT falla.
+    """
+    decada = f"{row}.anio_lanzamiento / 10 * 10"
+    tramo = f"{row}.duracion / {RUNTIME_BUCKET} * {RUNTIME_BUCKET}"
+    director = f"COALESCE({row}.director, '')"
+    return f"""
+    UPDATE peliculas_stats SET
+        peliculas = peliculas {sign} 1,
+        calificacion_suma = calificacion_suma {sign} COALESCE({row}.calificacion, 0),
+        calificacion_n = calificacion_n {sign} ({row}.calificacion IS NOT NULL),
+        duracion_suma = duracion_suma {sign} COALESCE({row}.duracion, 0),
+        duracion_n = duracion_n {sign} ({row}.duracion IS NOT NULL)
+    WHERE clave = 1;
+    INSERT INTO peliculas_stats_director (director)
+        SELECT {director}
+        WHERE NOT EXISTS (SELECT 1 FROM peliculas_stats_director WHERE director = {director});
+    UPDATE peliculas_stats_director SET
+        peliculas = peliculas {sign} 1,
+        calificacion_suma = calificacion_suma {sign} COALESCE({row}.calificacion, 0),
+        calificacion_n = calificacion_n {sign} ({row}.calificacion IS NOT NULL)
+    WHERE director = {director};
+    INSERT INTO peliculas_stats_decada (decada)
+        SELECT {decada}
+        WHERE {decada} IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM peliculas_stats_decada WHERE decada = {decada});
+    UPDATE peliculas_stats_decada SET peliculas = peliculas {sign} 1 WHERE decada = {decada};
+    INSERT INTO peliculas_stats_duracion (desde)
+        SELECT {tramo}
+        WHERE {tramo} IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM peliculas_stats_duracion WHERE desde = {tramo});
+    UPDATE peliculas_stats_duracion SET peliculas = peliculas {sign} 1 WHERE desde = {tramo};"""
+
+
+# Triggers de los resúmenes (nombre -> definición); ensure_stats() reemplaza
+# los de una base existente que tengan otra definición
+STATS_TRIGGERS = {
+    'peliculas_stats_ai': f"AFTER INSERT ON peliculas BEGIN{stats_delta('new', '+')}\nEND",
+    'peliculas_stats_ad': f"AFTER DELETE ON peliculas BEGIN{stats_delta('old', '-')}\nEND",
+    'peliculas_stats_au': (
+        "AFTER UPDATE OF director, anio_lanzamiento, duracion, calificacion ON peliculas "
+        f"BEGIN{stats_delta('old', '-')}{stats_delta('new', '+')}\nEND"
+    ),
+}
+SQL_STATS_TRIGGERS = ''.join(
+    f"\nCREATE TRIGGER IF NOT EXISTS {name} {body};\n" for name, body in STATS_TRIGGERS.items()
+)
+
+# Resúmenes de /films/stats mantenidos por triggers: cada escritura ajusta unos
+# pocos contadores (INSERT si falta la fila + UPDATE) y la consulta no recorre peliculas.
+# Las filas que llegan a 0 se conservan y se omiten al leer.
+SQL_STATS = f"""
+CREATE TABLE IF NOT EXISTS peliculas_stats (
+    clave INTEGER PRIMARY KEY CHECK (clave = 1),
+    peliculas INTEGER NOT NULL DEFAULT 0,
+    calificacion_suma REAL NOT NULL DEFAULT 0,
+    calificacion_n INTEGER NOT NULL DEFAULT 0,
+    duracion_suma INTEGER NOT NULL DEFAULT 0,
+    duracion_n INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO peliculas_stats (clave) VALUES (1);
+
+-- '' agrupa las películas sin director
+CREATE TABLE IF NOT EXISTS peliculas_stats_director (
+    director TEXT PRIMARY KEY COLLATE NOCASE,
+    peliculas INTEGER NOT NULL DEFAULT 0,
+    calificacion_suma REAL NOT NULL DEFAULT 0,
+    calificacion_n INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS peliculas_stats_decada (
+    decada INTEGER PRIMARY KEY,
+    peliculas INTEGER NOT NULL DEFAULT 0
 );
 
+CREATE TABLE IF NOT EXISTS peliculas_stats_duracion (
+    desde INTEGER PRIMARY KEY,
+    peliculas INTEGER NOT NULL DEFAULT 0
+);
+
+{SQL_STATS_TRIGGERS}"""
+
+# Recalcular los resúmenes desde cero: bases anteriores a las tablas de
+# resumen o cargas masivas hechas sin los triggers
+SQL_STATS_REBUILD = f"""
+DELETE FROM peliculas_stats_director;
+DELETE FROM peliculas_stats_decada;
+DELETE FROM peliculas_stats_duracion;
+UPDATE peliculas_stats SET
+    (peliculas, calificacion_suma, calificacion_n, duracion_suma, duracion_n) = (
+        SELECT COUNT(*), COALESCE(SUM(calificacion), 0), COUNT(calificacion),
+               COALESCE(SUM(duracion), 0), COUNT(duracion)
+        FROM peliculas
+    )
+WHERE clave = 1;
+INSERT INTO peliculas_stats_director (director, peliculas, calificacion_suma, calificacion_n)
+    SELECT COALESCE(director, ''), COUNT(*), COALESCE(SUM(calificacion), 0), COUNT(calificacion)
+    FROM peliculas GROUP BY COALESCE(director, '') COLLATE NOCASE;
+INSERT INTO peliculas_stats_decada (decada, peliculas)
+    SELECT anio_lanzamiento / 10 * 10, COUNT(*)
+    FROM peliculas WHERE anio_lanzamiento IS NOT NULL GROUP BY 1;
+INSERT INTO peliculas_stats_duracion (desde, peliculas)
+    SELECT duracion / {RUNTIME_BUCKET} * {RUNTIME_BUCKET}, COUNT(*)
+    FROM peliculas WHERE duracion IS NOT NULL GROUP BY 1;
+"""
+
+SQL_SCHEMA += SQL_FTS + SQL_INDEXES + SQL_STATS
+
+
+def ensure_indexes(conn):
+    """Crear los índices de /films en una base existente.
+
+    IF NOT EXISTS solo mira el nombre: un índice con el mismo nombre y otra
+    definición (los de una sola columna del init_db.py original) se borra y se
+    vuelve a crear.
+    """
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"))
+    stale = [
+        name for name, columns in INDEXES.items()
+        if name in existing and ' '.join(existing[name].split()) != f"CREATE INDEX {name} ON {columns}"
+    ]
+    stale += [name for name in OBSOLETE_INDEXES if name in existing]
+    with conn:
+        for name in stale:
+            print(f"Reemplazando el índice {name}...")
+            conn.execute(f"DROP INDEX {name}")
+        for name, columns in INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+
+
+def ensure_updated_at(conn):
+    """Agregar peliculas.updated_at a una base creada antes de la columna"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(peliculas)")}
+    if 'updated_at' not in columns:
+        print("Agregando peliculas.updated_at...")
+        with conn:
+            # ADD COLUMN no admite DEFAULT CURRENT_TIMESTAMP; las escrituras la fijan explícitamente
+            conn.execute("ALTER TABLE peliculas ADD COLUMN updated_at DATETIME")
+            conn.execute("UPDATE peliculas SET updated_at = created_at")
+
+
+def ensure_fts(conn):
+    """Crear el índice de /films/search/ en una base existente que no lo tenga"""
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'peliculas_fts'"
+    ).fetchone()
+    # Los triggers también llevan IF NOT EXISTS: se reponen si faltara alguno
+    conn.executescript(SQL_FTS)
+    if not has_fts:
+        print("Creando el índice de búsqueda de /films/search/...")
+        with conn:
+            conn.execute("INSERT INTO peliculas_fts(peliculas_fts) VALUES ('rebuild')")
+
+
+def ensure_stats(conn):
+    """Crear los resúmenes de /films/stats en una base existente que no los tenga.
+
+    Los triggers pueden ser de una versión anterior (con INSERT OR IGNORE, que
+    fallaba en los upserts): los que difieren de STATS_TRIGGERS se reemplazan.
+    """
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'peliculas_stats'"
+    ).fetchone()
+    if not has_stats:
+        print("Creando los resúmenes de /films/stats...")
+        # Una sola transacción: otro proceso que arranque a la vez espera y
+        # recalcula sobre tablas ya completas
+        conn.executescript(f"BEGIN IMMEDIATE;\n{SQL_STATS}{SQL_STATS_REBUILD}COMMIT;")
+        return
+    existing = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"))
+    stale = [
+        name for name, body in STATS_TRIGGERS.items()
+        if ' '.join(existing.get(name, '').split()) != ' '.join(f"CREATE TRIGGER {name} {body}".split())
+    ]
+    if stale:
+        print("Reemplazando los triggers de /films/stats...")
+        drops = ''.join(f"DROP TRIGGER IF EXISTS {name};\n" for name in stale)
+        conn.executescript(f"BEGIN IMMEDIATE;\n{drops}{SQL_STATS_TRIGGERS}COMMIT;")
+
+
+def upgrade_database(conn):
+    """Completar el esquema de una base creada con una versión anterior de init_db.py.
+
+    Cada paso revisa antes de escribir: en una base al día no hace cambios.
+    """
+    ensure_updated_at(conn)
+    ensure_indexes(conn)
+    ensure_fts(conn)
+    ensure_stats(conn)
+
+
+def upgrade_database_file(db_file):
+    """upgrade_database() sobre un archivo, si existe y ya tiene la tabla peliculas"""
+    if not os.path.exists(db_file):
+        return
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'peliculas'"
+        ).fetchone()
+        if has_table:
+            upgrade_database(conn)
+    finally:
+        conn.close()
+
+SQL_SEED = """
 INSERT INTO peliculas (id, titulo, titulo_original, director, productor, anio_lanzamiento, duracion, descripcion, imagen_url, calificacion) VALUES
 ('2baf70d1-42bb-4437-b551-e5fed5a87abe', 'El Castillo en el Cielo', 'Tenkū no Shiro Rapyuta',
  'Hayao Miyazaki', 'Isao Takahata', 1986, 124,
@@ -47,16 +320,20 @@ INSERT INTO peliculas (id, titulo, titulo_original, director, productor, anio_la
  'Hayao Miyazaki', 'Toshio Suzuki', 2004, 119,
  'Una joven es transformada en anciana por una bruja y busca refugio en un castillo mágico que camina.',
  'https://image.tmdb.org/t/p/w600_and_h900_bestv2/TkTPELWinKaWO3YCPvP1mprYHj.jpg', 8.7);
-
-CREATE INDEX idx_peliculas_titulo ON peliculas(titulo);
-CREATE INDEX idx_peliculas_anio ON peliculas(anio_lanzamiento);
 """
 
+SQL_INIT = SQL_SCHEMA + SQL_SEED
+
+
 def initialize_database():
     try:
         if os.path.exists(DB_FILE):
             os.remove(DB_FILE)
             print(f"Base de datos '{DB_FILE}' anterior eliminada.")
+        # Archivos del modo WAL que dejaría la base anterior
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(DB_FILE + suffix):
+                os.remove(DB_FILE + suffix)
 
         print(f"Conectando y creando la base de datos '{DB_FILE}'...")
         conn = sqlite3.connect(DB_FILE)
@@ -66,6 +343,8 @@ def initialize_database():
         cursor.executescript(SQL_INIT)
 
         conn.commit()
+        # WAL queda guardado en el archivo: los workers de serve.py leen mientras otro escribe
+        conn.execute("PRAGMA journal_mode=WAL")
         print(f"Base de datos '{DB_FILE}' creada y poblada exitosamente.")
 
     except sqlite3.Error as e:
@@ -74,5 +353,65 @@ def initialize_database():
         if conn:
             conn.close()
 
+def read_records(path):
+    """Leer películas desde un CSV con encabezados o un archivo JSONL"""
+    from loader import InvalidRecord
+
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                # Las celdas vacías del CSV equivalen a NULL
+                yield {k: (v if v != '' else None) for k, v in row.items()}
+    else:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        # Como en /films/bulk: la línea se informa como error y la carga sigue
+                        yield InvalidRecord(f"JSON inválido: {e}")
+
+def load_file(path, chunk_size):
+    """Cargar un CSV/JSONL en la base existente (upsert por id)"""
+    from database import PRAGMAS
+    from loader import load_records
+
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'peliculas'"
+        ).fetchone()
+        if not has_table:
+            print(f"Creando el esquema en '{DB_FILE}'...")
+            conn.executescript(SQL_SCHEMA)
+        else:
+            upgrade_database(conn)
+
+        print(f"Cargando '{path}' en '{DB_FILE}' (lotes de {chunk_size})...")
+        report = load_records(conn, read_records(path), chunk_size)
+
+        for error in report['errors']:
+            print(f"  fila {error['index']} (id={error['id']}): {error['error']}")
+        if report['errors_truncated']:
+            print(f"  ... {report['failed'] - len(report['errors'])} errores más")
+        print(
+            f"{report['upserted']} de {report['received']} películas guardadas, "
+            f"{report['failed']} rechazadas, en {report['elapsed_seconds']} s "
+            f"({report['rows_per_second']} filas/s)."
+        )
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Inicializar o cargar la base de datos de películas Ghibli")
+    parser.add_argument('--load', metavar='ARCHIVO', help="CSV o JSONL con películas a insertar/actualizar por id")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="Filas por transacción en la carga (por defecto 5000)")
+    args = parser.parse_args()
+
+    if args.load:
+        load_file(args.load, args.chunk_size)
+    else:
+        initialize_database()
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Carga masiva de películas: validación por lotes con Pydantic y upsert con
+executemany dentro de una transacción por lote.
+"""
+import sqlite3
+import time
+from typing import Any, Iterable, Iterator, List, Tuple, get_args
+
+from pydantic import ValidationError
+
+from models import Pelicula
+
+CHUNK_SIZE = 5000
+
+FIELDS = tuple(Pelicula.model_fields)
+
+# Campos Optional[...] de Pelicula: son obligatorios en el modelo, pero en una
+# carga masiva una columna o clave ausente equivale a NULL
+OPTIONAL_FIELDS = tuple(
+    name for name, field in Pelicula.model_fields.items() if type(None) in get_args(field.annotation)
+)
+
+UPSERT_SQL = f"""
+    INSERT INTO peliculas ({', '.join(FIELDS)}, updated_at)
+    VALUES ({', '.join('?' for _ in FIELDS)}, CURRENT_TIMESTAMP)
+    ON CONFLICT(id) DO UPDATE SET
+        {', '.join(f'{field} = excluded.{field}' for field in FIELDS if field != 'id')},
+        updated_at = excluded.updated_at
+"""
+
+
+class InvalidRecord:
+    """Registro que no se pudo leer (p. ej. una línea JSON inválida); se informa como error de su fila"""
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def validation_error(index: int, record: Any, message: str) -> dict:
+    film_id = record.get('id') if isinstance(record, dict) else None
+    return {"index": index, "id": film_id, "error": message}
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return '; '.join(
+        f"{'.'.join(str(loc) for loc in e['loc']) or 'registro'}: {e['msg']}"
+        for e in error.errors()
+    )
+
+
+def validate_chunk(records: Iterable[Tuple[int, Any]]) -> Tuple[List[Tuple[int, tuple]], List[dict]]:
+    """Validar registros (índice, dict) y convertirlos a tuplas en el orden de FIELDS"""
+    rows = []
+    errors = []
+    for index, record in records:
+        if isinstance(record, InvalidRecord):
+            errors.append(validation_error(index, None, record.message))
+            continue
+        if isinstance(record, dict):
+            record = {**dict.fromkeys(OPTIONAL_FIELDS), **record}
+        try:
+            pelicula = Pelicula.model_validate(record)
+        except ValidationError as e:
+            errors.append(validation_error(index, record, format_validation_error(e)))
+            continue
+        rows.append((index, tuple(getattr(pelicula, field) for field in FIELDS)))
+    return rows, errors
+
+
+def upsert_rows(conn: sqlite3.Connection, rows: List[Tuple[int, tuple]]) -> Tuple[int, List[dict]]:
+    """Insertar o actualizar por id en una sola transacción.
+
+    Si el lote completo falla por una restricción, se reintenta fila por fila
+    para informar exactamente qué registros fallaron.
+    """
+    try:
+        with conn:
+            conn.executemany(UPSERT_SQL, (values for _, values in rows))
+        return len(rows), []
+    except sqlite3.IntegrityError:
+        pass
+
+    upserted = 0
+    errors = []
+    with conn:
+        for index, values in rows:
+            try:
+                conn.execute(UPSERT_SQL, values)
+                upserted += 1
+            except sqlite3.IntegrityError as e:
+                errors.append({"index": index, "id": values[0], "error": str(e)})
+    return upserted, errors
+
+
+def load_chunk(conn: sqlite3.Connection, records: List[Tuple[int, Any]]) -> Tuple[int, List[dict]]:
+    """Validar y guardar un lote; devuelve (filas guardadas, errores por fila)"""
+    rows, errors = validate_chunk(records)
+    upserted = 0
+    if rows:
+        upserted, db_errors = upsert_rows(conn, rows)
+        errors.extend(db_errors)
+    return upserted, errors
+
+
+def chunked(records: Iterable[Any], size: int = CHUNK_SIZE) -> Iterator[List[Tuple[int, Any]]]:
+    """Agrupar registros en lotes de (índice, registro)"""
+    chunk = []
+    for item in enumerate(records):
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BulkReport:
+    """Resumen de una carga masiva"""
+
+    def __init__(self, max_errors: int = 1000):
+        self.max_errors = max_errors
+        self.received = 0
+        self.upserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.started = time.perf_counter()
+
+    def add(self, received: int, upserted: int, errors: List[dict]) -> None:
+        self.received += received
+        self.upserted += upserted
+        self.failed += len(errors)
+        self.errors.extend(errors[:max(0, self.max_errors - len(self.errors))])
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "received": self.received,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e['index']),
+            "errors_truncated": self.failed > len(self.errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.upserted / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def load_records(conn: sqlite3.Connection, records: Iterable[Any], chunk_size: int = CHUNK_SIZE) -> dict:
+    """Cargar un iterable de registros en lotes y devolver el reporte"""
+    report = BulkReport()
+    for chunk in chunked(records, chunk_size):
+        upserted, errors = load_chunk(conn, chunk)
+        report.add(len(chunk), upserted, errors)
+    return report.as_dict()
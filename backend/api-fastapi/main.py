@@ -1,14 +1,120 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import base64
+import binascii
+import json
 import sqlite3
 import os
-from decimal import Decimal
+from urllib.parse import urlencode
+
+from starlette.concurrency import run_in_threadpool
+
+from cache import CachedResponse, ResponseCache, http_date
+from compression import CompressionMiddleware, compression_stats
+from database import ChangeWatcher, ConnectionPool, DatabaseBusy, PoolTimeout
+from init_db import upgrade_database_file
+from loader import CHUNK_SIZE, BulkReport, chunked, load_chunk, validation_error
+from metrics import Gauge, MetricsMiddleware, observe_query, registry, serialization_timer
+from models import EstadisticasResponse, Pelicula, PeliculaBusquedaResponse, PeliculaResponse
+from queries import (
+    DEFAULT_SORT, FILM_SORTS, PELICULA_JSON_FIELDS, build_match_query, count_films, fetch_films,
+    fetch_film, fetch_films_page, fetch_stats_page, insert_film, json_array, ping, search_films_fts
+)
+from snapshot import SnapshotManager, SnapshotTooLarge
+
+try:
+    import orjson  # noqa: F401 - ORJSONResponse lo necesita
+    DefaultJSONResponse = ORJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
+
+DB_FILE = os.getenv('DB_FILE', './ghibli.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_WRITE_RETRIES = int(os.getenv('DB_WRITE_RETRIES', '3'))
+DB_WATCH_SECONDS = float(os.getenv('DB_WATCH_SECONDS', '1'))
+
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '512'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv('CACHE_TTL', '300'))
+CACHE_MAX_AGE = int(os.getenv('CACHE_MAX_AGE', '30'))
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+COMPRESSION_MEMO_BYTES = int(os.getenv('COMPRESSION_MEMO_BYTES', str(32 * 1024 * 1024)))
+
+SNAPSHOT_MODE = os.getenv('SNAPSHOT_MODE') == '1'
+SNAPSHOT_MAX_ROWS = int(os.getenv('SNAPSHOT_MAX_ROWS', '200000'))
+
+# Errores de capacidad de la base: se responden con 503 para que el cliente reintente
+DB_UNAVAILABLE = (DatabaseBusy, PoolTimeout)
+
+db = ConnectionPool(
+    DB_FILE, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, observer=observe_query, write_retries=DB_WRITE_RETRIES
+)
+cache = ResponseCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES)
+snapshot = SnapshotManager(db, max_rows=SNAPSHOT_MAX_ROWS, poll_interval=DB_WATCH_SECONDS) if SNAPSHOT_MODE else None
+watcher = ChangeWatcher(DB_FILE)
+
+# Cada snapshot nuevo deja obsoletas las respuestas en caché de /films
+if snapshot:
+    snapshot.on_change(lambda _: cache.invalidate('/films'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global snapshot
+    # `uvicorn main:app` sobre una base de una versión anterior: completar el
+    # esquema antes de atender (con serve.py ya está hecho y no cambia nada)
+    await run_in_threadpool(upgrade_database_file, DB_FILE)
+    if snapshot:
+        try:
+            await snapshot.start()
+        except SnapshotTooLarge as e:
+            print(f"Modo snapshot desactivado: {e}")
+            snapshot = None
+    # El snapshot ya vigila la base; sin él, la caché necesita su propio observador
+    watch = asyncio.create_task(watch_database()) if not snapshot and DB_WATCH_SECONDS > 0 else None
+    yield
+    if watch:
+        watch.cancel()
+        with suppress(asyncio.CancelledError):
+            await watch
+    if snapshot:
+        await snapshot.stop()
+    watcher.close()
+    db.close()
+
+async def watch_database() -> None:
+    """Invalidar la caché cuando otro proceso (p. ej. otro worker) escribe en la base"""
+    await run_in_threadpool(watcher.changed)
+    while True:
+        await asyncio.sleep(DB_WATCH_SECONDS)
+        try:
+            if await run_in_threadpool(watcher.changed):
+                cache.invalidate('/films')
+        except Exception as e:
+            print(f"Error al revisar cambios en la base: {e}")
+
+async def after_write(ids: Optional[List[str]] = None) -> None:
+    """Invalidar la caché y publicar un snapshot nuevo tras una escritura.
+
+    Con los ids escritos el snapshot relee solo esas filas; sin ellos lo recarga completo.
+    """
+    cache.invalidate('/films')
+    if snapshot:
+        await snapshot.update(ids)
+
 app = FastAPI(
     title="API de Películas Ghibli (con SQLite)",
     description="API REST con FastAPI y SQLite",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse
 )
 
 app.add_middleware(
@@ -17,61 +123,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Sin esto el navegador oculta a otros orígenes los headers de paginación y caché
+    expose_headers=["X-Next-Cursor", "Link", "ETag", "Last-Modified"],
 )
-
-DB_FILE = os.getenv('DB_FILE', './ghibli.db')
-
-def get_db_connection():
-    """Crear conexión a la base de datos"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.row_factory = sqlite3.Row
-        return conn
-    except Exception as e:
-        print(f"Error al conectar a la base de datos: {e}")
-        raise
-
-class Pelicula(BaseModel):
-    id: str
-    titulo: str
-    titulo_original: Optional[str]
-    director: str
-    productor: Optional[str]
-    anio_lanzamiento: int
-    duracion: int
-    descripcion: str
-    imagen_url: Optional[str]
-    calificacion: Optional[float]
-
-    class Config:
-        from_attributes = True
-
-class PeliculaResponse(BaseModel):
-    id: str
-    title: str
-    original_title: Optional[str]
-    director: str
-    producer: Optional[str]
-    release_date: str
-    running_time: str
-    description: str
-    image: Optional[str]
-    rt_score: Optional[str]
-
-def format_pelicula(row: sqlite3.Row) -> dict:
-    """Formatear película al formato de la API original de Ghibli"""
-    return {
-        "id": row['id'],
-        "title": row['titulo'],
-        "original_title": row['titulo_original'] or row['titulo'],
-        "director": row['director'],
-        "producer": row['productor'] or '',
-        "release_date": str(row['anio_lanzamiento']),
-        "running_time": str(row['duracion']),
-        "description": row['descripcion'],
-        "image": row['imagen_url'] or '',
-        "rt_score": str(int(row['calificacion'] * 10)) if row['calificacion'] else '0'
-    }
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
+    memo_max_bytes=COMPRESSION_MEMO_BYTES,
+)
+# Por fuera de la compresión: la latencia medida la incluye
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(DatabaseBusy)
+@app.exception_handler(PoolTimeout)
+async def database_unavailable(request: Request, exc: Exception):
+    """Base ocupada por otro escritor o pool agotado: error temporal, no un 500"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Base de datos ocupada, reintente: {exc}"},
+        headers={"Retry-After": "1"}
+    )
+
+registry.register(Gauge(
+    'db_pool_connections', 'Conexiones del pool SQLite por estado',
+    lambda: {(state,): value for state, value in db.metrics().items() if state in ('open', 'in_use', 'idle', 'waiters')},
+    labels=('state',)
+))
+registry.register(Gauge(
+    'db_write_events_total', 'Escrituras confirmadas, reintentos por lock y escrituras rechazadas con 503',
+    lambda: {(event,): value for event, value in db.metrics().items()
+             if event in ('writes', 'write_retries', 'busy_errors')},
+    labels=('event',), kind='counter'
+))
+registry.register(Gauge(
+    'response_compression_bytes_total', 'Bytes antes y después de comprimir respuestas',
+    lambda: {('in',): compression_stats.bytes_in, ('out',): compression_stats.bytes_out},
+    labels=('direction',), kind='counter'
+))
+registry.register(Gauge(
+    'response_cache_events_total', 'Eventos de la caché de respuestas',
+    lambda: {(event,): value for event, value in cache.stats().items()
+             if event in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')},
+    labels=('event',), kind='counter'
+))
 
 @app.get("/")
 async def root():
@@ -80,164 +176,398 @@ async def root():
         "message": "API de Películas Ghibli funcionando correctamente (con SQLite)",
         "version": "1.0.0",
         "endpoints": [
-            "GET /films - Listar todas las películas",
+            "GET /films - Listar películas (filtros, orden y campos opcionales)",
+            "GET /films/export?format=ndjson - Exportar el catálogo en streaming",
+            "GET /films/stats - Estadísticas del catálogo",
             "GET /films/{id} - Obtener película por ID",
-            "GET /films/search?q=titulo - Buscar películas",
+            "GET /films/search?q=texto - Buscar películas (texto completo)",
+            "POST /films/bulk - Carga masiva (arreglo JSON o NDJSON)",
+            "GET /metrics - Métricas en formato Prometheus",
             "GET /docs - Documentación interactiva (Swagger)"
         ]
     }
 
+def encode_cursor(anio: int, film_id: str) -> str:
+    """Cursor opaco con la clave de orden (anio_lanzamiento, id) de la última fila"""
+    raw = json.dumps([anio, film_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token: str) -> Tuple[int, str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        anio, film_id = json.loads(raw)
+        if not isinstance(anio, int) or not isinstance(film_id, str):
+            raise ValueError
+        return anio, film_id
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validar la proyección `fields=id,title` contra los campos de la respuesta"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in PELICULA_JSON_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos: {', '.join(unknown)}. Válidos: {', '.join(PELICULA_JSON_FIELDS)}"
+        )
+    return names
+
+def canonical_query(params: Dict[str, Any]) -> str:
+    """Parámetros ya validados (sin los None) en orden canónico"""
+    return urlencode(sorted((name, value) for name, value in params.items() if value is not None))
+
+def cache_key(request: Request, params: Optional[Dict[str, Any]] = None) -> str:
+    """Clave de caché: ruta más los parámetros reconocidos por el endpoint
+
+    Los parámetros desconocidos no forman parte de la clave, así que `?x=1`,
+    `?x=2`... no llenan la caché con copias de la misma respuesta.
+    """
+    return f'{request.url.path}?{canonical_query(params or {})}'
+
+def cached_json_response(request: Request, entry: CachedResponse) -> Response:
+    """Responder desde la caché, con 304 si el cliente ya tiene esta versión"""
+    headers = {
+        'ETag': entry.etag,
+        'Cache-Control': f'public, max-age={CACHE_MAX_AGE}',
+        **entry.headers
+    }
+    if entry.last_modified:
+        headers['Last-Modified'] = entry.last_modified
+    if entry.not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since')):
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type='application/json', headers=headers)
+
 @app.get("/films", response_model=List[PeliculaResponse])
 async def get_films(
-    limit: Optional[int] = Query(None, description="Límite de resultados"),
-    offset: Optional[int] = Query(0, description="Offset para paginación")
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, description="Límite de resultados"),
+    offset: Optional[int] = Query(0, ge=0, description="Offset para paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco de la página siguiente (header X-Next-Cursor)"),
+    director: Optional[str] = Query(None, description="Director (sin distinguir mayúsculas)"),
+    producer: Optional[str] = Query(None, description="Productor (sin distinguir mayúsculas)"),
+    year_min: Optional[int] = Query(None, description="Año de estreno mínimo"),
+    year_max: Optional[int] = Query(None, description="Año de estreno máximo"),
+    rating_min: Optional[float] = Query(None, ge=0, le=10, description="Calificación mínima (0 a 10)"),
+    rating_max: Optional[float] = Query(None, ge=0, le=10, description="Calificación máxima (0 a 10)"),
+    runtime_min: Optional[int] = Query(None, ge=0, description="Duración mínima en minutos"),
+    runtime_max: Optional[int] = Query(None, ge=0, description="Duración máxima en minutos"),
+    sort: str = Query(DEFAULT_SORT, description=f"Orden: {', '.join(FILM_SORTS)}"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma, p. ej. id,title")
 ):
     """
     Obtener lista de todas las películas de Studio Ghibli
-    """
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        query = """
-            SELECT id, titulo, titulo_original, director, productor,
-                   anio_lanzamiento, duracion, descripcion, imagen_url, calificacion
-            FROM peliculas
-            ORDER BY anio_lanzamiento DESC
-        """
 
-        params = []
-        if limit:
-            query += f" LIMIT ?"
-            params.append(limit)
-        if offset:
-            query += f" OFFSET ?"
-            params.append(offset)
+    Con `limit`, la respuesta incluye los headers `X-Next-Cursor` y `Link` para
+    pedir la página siguiente por cursor, sin el costo de un OFFSET profundo.
+    El cursor solo está disponible con el orden por defecto (`sort=-year`).
 
-        cur.execute(query, tuple(params))
-        rows = cur.fetchall()
+    Los filtros se combinan con AND; `fields` reduce tanto las columnas que lee
+    SQLite como el JSON de la respuesta.
+    """
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Use cursor u offset, no ambos")
+    if sort not in FILM_SORTS:
+        raise HTTPException(status_code=400, detail=f"Orden inválido. Válidos: {', '.join(FILM_SORTS)}")
+    if cursor and sort != DEFAULT_SORT:
+        raise HTTPException(status_code=400, detail=f"El cursor solo está disponible con sort={DEFAULT_SORT}")
+    after = decode_cursor(cursor) if cursor else None
+    projection = parse_fields(fields)
+    filters = {
+        name: value for name, value in (
+            ('director', director), ('producer', producer),
+            ('year_min', year_min), ('year_max', year_max),
+            ('rating_min', rating_min), ('rating_max', rating_max),
+            ('runtime_min', runtime_min), ('runtime_max', runtime_max),
+        ) if value is not None
+    }
 
-        cur.close()
-        conn.close()
+    params = {
+        'limit': limit, 'offset': offset or None, 'cursor': cursor, 'sort': sort,
+        'fields': ','.join(projection) if projection else None, **filters
+    }
+    key = cache_key(request, params)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation
+        # El snapshot solo guarda el listado completo en el orden por defecto
+        if snapshot and not filters and sort == DEFAULT_SORT and projection is None:
+            catalog = snapshot.current
+            rows, last_modified = catalog.page(limit, offset, after), catalog.last_modified
+        else:
+            try:
+                rows, last_modified = await db.run(
+                    fetch_films_page, limit, offset, after, filters, sort, projection
+                )
+            except DB_UNAVAILABLE:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error al obtener películas: {str(e)}")
+
+        headers = {}
+        if limit and len(rows) == limit and sort == DEFAULT_SORT:
+            next_cursor = encode_cursor(*rows[-1][:2])
+            next_url = request.url.replace(query=canonical_query({**params, 'offset': None, 'cursor': next_cursor}))
+            headers['X-Next-Cursor'] = next_cursor
+            headers['Link'] = f'<{next_url}>; rel="next"'
+
+        with serialization_timer():
+            body = json_array(row[2] for row in rows)
+        entry = cache.put(key, body, http_date(last_modified), headers, generation)
+
+    return cached_json_response(request, entry)
+
+async def stream_films(fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Recorrer el catálogo por lotes con cursor, sin cargarlo completo en memoria"""
+    after = None
+    first = True
+    # En modo snapshot el recorrido usa una versión fija del catálogo
+    catalog = snapshot.current if snapshot else None
+    if fmt == 'json':
+        yield b'['
+    while True:
+        if catalog:
+            rows = catalog.page(batch_size, None, after)
+        else:
+            rows = await db.run(fetch_films, batch_size, None, after)
+        if not rows:
+            break
+        with serialization_timer():
+            if fmt == 'ndjson':
+                chunk = ''.join(row[2] + '\n' for row in rows)
+            else:
+                chunk = ('' if first else ',') + ','.join(row[2] for row in rows)
+            chunk = chunk.encode()
+        first = False
+        yield chunk
+        if len(rows) < batch_size:
+            break
+        after = rows[-1][:2]
+    if fmt == 'json':
+        yield b']'
+
+@app.get("/films/export")
+async def export_films(
+    format: str = Query('ndjson', pattern='^(ndjson|json)$', description="ndjson o json (arreglo)"),
+    batch_size: int = Query(500, ge=1, le=5000, description="Filas leídas por lote")
+):
+    """
+    Exportar el catálogo completo en streaming (NDJSON o arreglo JSON)
+    """
+    media_type = 'application/x-ndjson' if format == 'ndjson' else 'application/json'
+    return StreamingResponse(stream_films(format, batch_size), media_type=media_type)
 
-        return [format_pelicula(row) for row in rows]
+@app.get("/films/stats", response_model=EstadisticasResponse)
+async def get_films_stats(request: Request):
+    """
+    Estadísticas del catálogo: películas por director y por década,
+    calificación y duración promedio, y distribución de duraciones
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al obtener películas: {str(e)}")
+    Se leen de tablas de resumen que los triggers de `peliculas` actualizan en
+    cada escritura, sin recorrer el catálogo.
+    """
+    key = cache_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation
+        try:
+            stats, last_modified = await db.run(fetch_stats_page)
+        except DB_UNAVAILABLE:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error al obtener estadísticas: {str(e)}")
+
+        with serialization_timer():
+            body = json.dumps(stats, ensure_ascii=False, separators=(',', ':')).encode()
+        entry = cache.put(key, body, http_date(last_modified), {}, generation)
+
+    return cached_json_response(request, entry)
 
 @app.get("/films/{film_id}", response_model=PeliculaResponse)
-async def get_film(film_id: str):
+async def get_film(request: Request, film_id: str):
     """
     Obtener detalle de una película por ID
     """
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, titulo, titulo_original, director, productor,
-                   anio_lanzamiento, duracion, descripcion, imagen_url, calificacion
-            FROM peliculas
-            WHERE id = ?
-        """, (film_id,))
-
-        row = cur.fetchone()
-
-        cur.close()
-        conn.close()
+    key = cache_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation
+        if snapshot:
+            row = snapshot.current.get(film_id)
+            row = row[2:] if row else None
+        else:
+            try:
+                row = await db.run(fetch_film, film_id)
+            except sqlite3.Error as e:
+                raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
 
         if not row:
             raise HTTPException(status_code=404, detail="Película no encontrada")
 
-        return format_pelicula(row)
+        film_json, updated_at = row
+        with serialization_timer():
+            body = film_json.encode()
+        entry = cache.put(key, body, http_date(updated_at), generation=generation)
 
-    except sqlite3.Error as e:
-        raise HTTPException(status_code=500, detail=f"Error de base de datos: {str(e)}")
+    return cached_json_response(request, entry)
 
-@app.get("/films/search/", response_model=List[PeliculaResponse])
-async def search_films(q: str = Query(..., description="Término de búsqueda")):
-    """
-    Buscar películas por título
+@app.get("/films/search/", response_model=List[PeliculaBusquedaResponse])
+async def search_films(
+    q: str = Query(..., description="Término de búsqueda"),
+    limit: int = Query(20, ge=1, le=100, description="Límite de resultados"),
+    highlight: bool = Query(False, description="Incluir fragmento resaltado con <mark>")
+):
     """
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT id, titulo, titulo_original, director, productor,
-                   anio_lanzamiento, duracion, descripcion, imagen_url, calificacion
-            FROM peliculas
-            WHERE LOWER(titulo) LIKE LOWER(?)
-               OR LOWER(titulo_original) LIKE LOWER(?)
-            ORDER BY anio_lanzamiento DESC
-        """, (f'%{q}%', f'%{q}%'))
-
-        rows = cur.fetchall()
+    Buscar películas por título, director, productor o descripción
 
-        cur.close()
-        conn.close()
-
-        return [format_pelicula(row) for row in rows]
+    Usa el índice FTS5: resultados ordenados por relevancia (bm25), búsqueda por
+    prefijo e insensible a acentos.
+    """
+    match = build_match_query(q)
+    if not match:
+        return []
 
+    try:
+        rows = await db.run(search_films_fts, match, limit, highlight)
+    except DB_UNAVAILABLE:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al buscar películas: {str(e)}")
 
+    with serialization_timer():
+        body = json_array(rows)
+    return Response(body, media_type='application/json')
+
 @app.post("/films", response_model=dict)
 async def create_film(pelicula: Pelicula):
     """
     Crear una nueva película (BONUS)
     """
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            INSERT INTO peliculas (id, titulo, titulo_original, director, productor,
-                                 anio_lanzamiento, duracion, descripcion, imagen_url, calificacion)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            pelicula.id,
-            pelicula.titulo,
-            pelicula.titulo_original,
-            pelicula.director,
-            pelicula.productor,
-            pelicula.anio_lanzamiento,
-            pelicula.duracion,
-            pelicula.descripcion,
-            pelicula.imagen_url,
-            pelicula.calificacion
-        ))
-
-        new_id = cur.lastrowid
-        conn.commit()
-
-        cur.close()
-        conn.close()
-
+        new_id = await db.write(insert_film, pelicula)
+        await after_write([pelicula.id])
         return {"message": "Película creada exitosamente", "id": new_id}
 
+    except DB_UNAVAILABLE:
+        raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear película: {str(e)}")
 
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+async def iter_ndjson_lines(request: Request) -> AsyncIterator[Tuple[int, bytes]]:
+    """Leer el cuerpo NDJSON a medida que llega, línea por línea"""
+    buffer = b''
+    index = 0
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield index, line
+                index += 1
+    if buffer.strip():
+        yield index, buffer
+
+@app.post("/films/bulk")
+async def bulk_create_films(
+    request: Request,
+    chunk_size: int = Query(CHUNK_SIZE, ge=1, le=50000, description="Filas por transacción")
+):
+    """
+    Carga masiva de películas (arreglo JSON o NDJSON)
+
+    Inserta o actualiza por `id` en lotes y devuelve un reporte con los errores
+    de cada fila rechazada y el rendimiento en filas por segundo.
+    """
+    report = BulkReport()
+    # Ids enviados, para que el snapshot relea solo esas filas (None: demasiados)
+    written_ids: Optional[List[str]] = []
+
+    async def flush(chunk: List[Tuple[int, Any]], parse_errors: List[dict]) -> None:
+        nonlocal written_ids
+        upserted, errors = await db.write(load_chunk, chunk) if chunk else (0, [])
+        report.add(len(chunk) + len(parse_errors), upserted, errors + parse_errors)
+        if snapshot and written_ids is not None:
+            written_ids += [
+                record['id'] for _, record in chunk
+                if isinstance(record, dict) and isinstance(record.get('id'), str)
+            ]
+            if len(written_ids) > snapshot.max_updated_rows:
+                written_ids = None
+
+    content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    try:
+        if content_type in NDJSON_MEDIA_TYPES:
+            chunk, parse_errors = [], []
+            async for index, line in iter_ndjson_lines(request):
+                try:
+                    chunk.append((index, json.loads(line)))
+                except ValueError as e:
+                    parse_errors.append(validation_error(index, None, f"JSON inválido: {e}"))
+                if len(chunk) + len(parse_errors) >= chunk_size:
+                    await flush(chunk, parse_errors)
+                    chunk, parse_errors = [], []
+            await flush(chunk, parse_errors)
+        else:
+            try:
+                records = json.loads(await request.body())
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+            if not isinstance(records, list):
+                raise HTTPException(status_code=400, detail="Se esperaba un arreglo JSON de películas")
+            for chunk in chunked(records, chunk_size):
+                await flush(chunk, [])
+
+    except DB_UNAVAILABLE as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Base de datos ocupada tras guardar {report.upserted} películas: {str(e)}",
+            headers={"Retry-After": "1"}
+        )
+    except sqlite3.Error as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error en la carga masiva tras guardar {report.upserted} películas: {str(e)}"
+        )
+    finally:
+        if report.upserted:
+            await after_write(written_ids)
+
+    return report.as_dict()
+
 @app.get("/health")
 async def health_check():
     """Verificar estado de la API y conexión a la base de datos"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) as count FROM peliculas")
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        # En modo snapshot el conteo sale de la copia en memoria, sin un COUNT(*) por
+        # sondeo; igual se consulta la base para saber que responde
+        if snapshot:
+            await db.run(ping)
+            films_count = len(snapshot.current)
+        else:
+            films_count = await db.run(count_films)
 
         return {
             "status": "healthy",
             "database": "connected",
-            "films_count": result['count']
+            "films_count": films_count,
+            "pool": db.metrics(),
+            "cache": cache.stats(),
+            "compression": compression_stats.as_dict(),
+            "snapshot": snapshot.stats() if snapshot else {"enabled": False}
         }
     except Exception as e:
         return {
             "status": "unhealthy",
             "database": "disconnected",
-            "error": str(e)
+            "error": str(e),
+            "pool": db.metrics()
         }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(registry.render(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,328 @@
+"""
+Instrumentación de la API: histogramas en memoria expuestos en formato de
+texto de Prometheus, desglose de tiempos por petición (SQL, serialización) y
+un perfilador por muestreo opcional para peticiones lentas.
+"""
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, seguro entre hilos"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # [conteo por bucket..., +Inf, suma]
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                le_label = f'le="{le}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, label_values, le_label)} {int(cumulative)}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, label_values)} {counts[-1]}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, label_values)} {int(cumulative)}')
+        return lines
+
+
+class Gauge:
+    """Valor instantáneo leído al momento de exponer las métricas"""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], Dict[Tuple[str, ...], float]], labels: Tuple[str, ...] = (), kind: str = 'gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labels = labels
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for label_values, value in sorted(self.read().items()):
+            lines.append(f'{self.name}{format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'Latencia de las peticiones HTTP por ruta',
+    ('method', 'route', 'status'), LATENCY_BUCKETS
+))
+SQL_LATENCY = registry.register(Histogram(
+    'db_query_duration_seconds', 'Tiempo de ejecución de cada consulta SQL (sin espera del pool)',
+    ('query',), LATENCY_BUCKETS
+))
+SQL_ROWS = registry.register(Histogram(
+    'db_query_rows', 'Filas devueltas por consulta', ('query',), ROW_BUCKETS
+))
+SERIALIZATION_LATENCY = registry.register(Histogram(
+    'response_serialization_seconds', 'Tiempo armando el cuerpo JSON de la respuesta',
+    ('route',), LATENCY_BUCKETS
+))
+
+_in_progress = 0
+_in_progress_lock = threading.Lock()
+registry.register(Gauge(
+    'http_requests_in_progress', 'Peticiones HTTP en curso', lambda: {(): _in_progress}
+))
+
+
+class RequestTimings:
+    """Desglose de tiempos de una petición"""
+    __slots__ = ('route', 'sql_seconds', 'sql_queries', 'sql_rows', 'serialization_seconds')
+
+    def __init__(self):
+        self.route = ''
+        self.sql_seconds = 0.0
+        self.sql_queries = 0
+        self.sql_rows = 0
+        self.serialization_seconds = 0.0
+
+    def server_timing(self, total: float) -> str:
+        """Valor del header Server-Timing (visible en las DevTools del navegador)"""
+        app = max(total - self.sql_seconds - self.serialization_seconds, 0.0)
+        return ', '.join([
+            f'db;dur={self.sql_seconds * 1000:.3f};desc="{self.sql_queries} consultas, {self.sql_rows} filas"',
+            f'serialize;dur={self.serialization_seconds * 1000:.3f}',
+            f'app;dur={app * 1000:.3f}',
+            f'total;dur={total * 1000:.3f}',
+        ])
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar('current_timings', default=None)
+
+
+def count_rows(result: Any) -> int:
+    """Filas de un resultado de consulta: listas, (lista, extra), una fila o None"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return 1
+
+
+def observe_query(name: str, seconds: float, result: Any) -> None:
+    """Registrar una consulta; se llama desde el event loop tras ConnectionPool.run"""
+    rows = count_rows(result)
+    SQL_LATENCY.observe(seconds, name)
+    SQL_ROWS.observe(rows, name)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.sql_seconds += seconds
+        timings.sql_queries += 1
+        timings.sql_rows += rows
+
+
+@contextmanager
+def serialization_timer() -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.serialization_seconds += time.perf_counter() - start
+
+
+class StackSampler(threading.Thread):
+    """Perfilador por muestreo: guarda las pilas de todos los hilos en formato
+    "folded" (una línea por pila con su conteo), compatible con flamegraph.pl
+    y speedscope."""
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def dump(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia por ruta, desglose por petición y perfilado opcional.
+
+    - `X-Profile: 1` (o PROFILE_TIMING=1) agrega el header Server-Timing.
+    - PROFILE_SLOW_MS registra en consola el desglose de las peticiones lentas.
+    - PROFILE_DIR (con PROFILE_SAMPLE=1) muestrea las pilas durante la petición
+      y guarda un perfil .folded si resultó lenta. `X-Profile: <PROFILE_TOKEN>`
+      perfila una petición puntual aunque no sea lenta; sin PROFILE_TOKEN el
+      header no escribe archivos. Se guardan a lo sumo PROFILE_MAX_FILES perfiles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.timing_always = os.getenv('PROFILE_TIMING') == '1'
+        self.slow_seconds = float(os.getenv('PROFILE_SLOW_MS', '0')) / 1000
+        self.profile_dir = os.getenv('PROFILE_DIR')
+        self.sample_always = os.getenv('PROFILE_SAMPLE') == '1'
+        self.profile_token = os.getenv('PROFILE_TOKEN', '').encode()
+        self.max_profiles = int(os.getenv('PROFILE_MAX_FILES', '100'))
+        self._profiles_written = 0
+        self._profiles_lock = threading.Lock()
+        self._routes: Optional[Dict[Any, str]] = None
+
+    def route_for(self, scope) -> str:
+        if self._routes is None and 'app' in scope:
+            self._routes = {
+                getattr(route, 'endpoint', None): route.path for route in scope['app'].routes
+            }
+        return (self._routes or {}).get(scope.get('endpoint'), 'sin_ruta')
+
+    def profile_authorized(self, value: Optional[bytes]) -> bool:
+        """¿El header X-Profile trae el token que habilita perfilar a pedido?"""
+        return bool(self.profile_token) and value is not None and hmac.compare_digest(value, self.profile_token)
+
+    def reserve_profile(self) -> bool:
+        """Descontar un archivo del cupo de PROFILE_MAX_FILES; False si ya se agotó"""
+        with self._profiles_lock:
+            if self._profiles_written >= self.max_profiles:
+                return False
+            self._profiles_written += 1
+            if self._profiles_written == self.max_profiles:
+                print(f"Se alcanzó PROFILE_MAX_FILES ({self.max_profiles}); no se guardarán más perfiles")
+            return True
+
+    def write_profile(self, sampler: StackSampler, scope, route: str) -> None:
+        if not self.reserve_profile():
+            return
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f"{time.time_ns()}-{scope['method']}-{slug}.folded"
+        os.makedirs(self.profile_dir, exist_ok=True)
+        sampler.dump(os.path.join(self.profile_dir, name))
+
+    async def __call__(self, scope, receive, send):
+        global _in_progress
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        profile_header = next((value for name, value in scope['headers'] if name == b'x-profile'), None)
+        requested = profile_header not in (None, b'', b'0')
+        with_timing = requested or self.timing_always
+        # Perfilar a pedido escribe en disco: solo con el token, nunca con cualquier valor
+        authorized = self.profile_authorized(profile_header)
+        sampler = None
+        if self.profile_dir and (authorized or self.sample_always) and self._profiles_written < self.max_profiles:
+            sampler = StackSampler()
+            sampler.start()
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                timings.route = self.route_for(scope)
+                if with_timing:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', timings.server_timing(time.perf_counter() - start).encode()))
+                    message = {**message, 'headers': headers}
+            await send(message)
+
+        with _in_progress_lock:
+            _in_progress += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _in_progress_lock:
+                _in_progress -= 1
+            current_timings.reset(token)
+            route = timings.route or self.route_for(scope)
+            REQUEST_LATENCY.observe(elapsed, scope['method'], route, str(status))
+            if timings.serialization_seconds:
+                SERIALIZATION_LATENCY.observe(timings.serialization_seconds, route)
+
+            slow = self.slow_seconds and elapsed >= self.slow_seconds
+            if slow:
+                print(f"Petición lenta {scope['method']} {scope['path']} ({status}): "
+                      f"{timings.server_timing(elapsed)}")
+            if sampler is not None:
+                sampler.stop()
+                if slow or authorized:
+                    self.write_profile(sampler, scope, route)
@@ -0,0 +1,55 @@
+"""Modelos Pydantic de entrada y salida de la API de películas"""
+from pydantic import BaseModel
+from typing import List, Optional
+
+class Pelicula(BaseModel):
+    id: str
+    titulo: str
+    titulo_original: Optional[str]
+    director: str
+    productor: Optional[str]
+    anio_lanzamiento: int
+    duracion: int
+    descripcion: str
+    imagen_url: Optional[str]
+    calificacion: Optional[float]
+
+    class Config:
+        from_attributes = True
+
+class PeliculaResponse(BaseModel):
+    id: str
+    title: str
+    original_title: Optional[str]
+    director: str
+    producer: Optional[str]
+    release_date: str
+    running_time: str
+    description: str
+    image: Optional[str]
+    rt_score: Optional[str]
+
+class PeliculaBusquedaResponse(PeliculaResponse):
+    snippet: Optional[str] = None
+
+class EstadisticasDirector(BaseModel):
+    director: Optional[str]
+    films: int
+    average_rating: Optional[float]
+
+class EstadisticasDecada(BaseModel):
+    decade: int
+    films: int
+
+class TramoDuracion(BaseModel):
+    from_minutes: int
+    to_minutes: int
+    films: int
+
+class EstadisticasResponse(BaseModel):
+    films: int
+    average_rating: Optional[float]
+    average_runtime: Optional[float]
+    by_director: List[EstadisticasDirector]
+    by_decade: List[EstadisticasDecada]
+    runtime_distribution: List[TramoDuracion]
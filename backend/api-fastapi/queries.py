@@ -0,0 +1,307 @@
+"""
+Consultas SQL de la API de películas.
+
+Las filas se devuelven ya serializadas: SQLite arma el JSON en formato de la
+API original de Ghibli con json_object(), sin dicts intermedios ni una segunda
+validación con Pydantic. El resultado es idéntico byte a byte a validar
+format_pelicula() con PeliculaResponse y serializar con JSONResponse.
+"""
+import html
+import json
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from models import Pelicula
+
+# Campo de PeliculaResponse -> expresión SQL ({t} es el prefijo de tabla)
+PELICULA_JSON_FIELDS = {
+    'id': "{t}id",
+    'title': "{t}titulo",
+    'original_title': "COALESCE(NULLIF({t}titulo_original, ''), {t}titulo)",
+    'director': "{t}director",
+    'producer': "COALESCE({t}productor, '')",
+    'release_date': "CAST({t}anio_lanzamiento AS TEXT)",
+    'running_time': "CAST({t}duracion AS TEXT)",
+    'description': "{t}descripcion",
+    'image': "COALESCE({t}imagen_url, '')",
+    # str(int(calificacion * 10)): CAST trunca hacia cero igual que int()
+    'rt_score': "CASE WHEN {t}calificacion THEN CAST(CAST({t}calificacion * 10 AS INTEGER) AS TEXT) ELSE '0' END",
+}
+
+
+def pelicula_json(table: str = '', extra: Optional[dict] = None, fields: Optional[Sequence[str]] = None) -> str:
+    """Expresión json_object() que produce una película en formato Ghibli.
+
+    Con `fields` solo se incluyen esos campos (en el orden de PELICULA_JSON_FIELDS),
+    así que SQLite tampoco lee las columnas que no se piden.
+    """
+    prefix = f'{table}.' if table else ''
+    pairs = [
+        f"'{name}', {expr.format(t=prefix)}" for name, expr in PELICULA_JSON_FIELDS.items()
+        if fields is None or name in fields
+    ]
+    pairs += [f"'{name}', {expr}" for name, expr in (extra or {}).items()]
+    return f"json_object({', '.join(pairs)})"
+
+
+PELICULA_JSON = pelicula_json()
+
+
+def json_array(items: Iterable[str]) -> bytes:
+    """Unir objetos JSON ya serializados en un arreglo"""
+    return ('[' + ','.join(items) + ']').encode()
+
+
+# Filtro de /films -> condición SQL; cada combinación tiene un índice en init_db.py
+FILM_FILTERS = {
+    'director': "director = ? COLLATE NOCASE",
+    'producer': "productor = ? COLLATE NOCASE",
+    'year_min': "anio_lanzamiento >= ?",
+    'year_max': "anio_lanzamiento <= ?",
+    'rating_min': "calificacion >= ?",
+    'rating_max': "calificacion <= ?",
+    'runtime_min': "duracion >= ?",
+    'runtime_max': "duracion <= ?",
+}
+
+# Orden de /films -> ORDER BY; id desempata para que las páginas sean estables
+FILM_SORTS = {
+    '-year': "anio_lanzamiento DESC, id DESC",
+    'year': "anio_lanzamiento ASC, id ASC",
+    'title': "titulo ASC, id ASC",
+    '-title': "titulo DESC, id DESC",
+    'rating': "calificacion ASC, id ASC",
+    '-rating': "calificacion DESC, id DESC",
+    'runtime': "duracion ASC, id ASC",
+    '-runtime': "duracion DESC, id DESC",
+}
+
+# Único orden con paginación por cursor: (anio_lanzamiento, id) descendente
+DEFAULT_SORT = '-year'
+
+
+def films_query(
+    limit: Optional[int],
+    offset: Optional[int] = None,
+    after: Optional[Tuple[int, str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    sort: str = DEFAULT_SORT,
+    fields: Optional[Sequence[str]] = None
+) -> Tuple[str, tuple]:
+    """SQL y parámetros del listado de /films (ver FILM_FILTERS y FILM_SORTS)"""
+    query = f"""
+        SELECT anio_lanzamiento, id, {pelicula_json(fields=fields)}
+        FROM peliculas
+    """
+
+    conditions = []
+    params: List[Any] = []
+    for name, value in (filters or {}).items():
+        if value is not None:
+            conditions.append(FILM_FILTERS[name])
+            params.append(value)
+    if after:
+        conditions.append("(anio_lanzamiento, id) < (?, ?)")
+        params.extend(after)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {FILM_SORTS[sort]}"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    if offset:
+        # SQLite exige LIMIT para usar OFFSET
+        if not limit:
+            query += " LIMIT -1"
+        query += " OFFSET ?"
+        params.append(offset)
+    return query, tuple(params)
+
+
+def fetch_films(
+    conn: sqlite3.Connection,
+    limit: Optional[int],
+    offset: Optional[int] = None,
+    after: Optional[Tuple[int, str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    sort: str = DEFAULT_SORT,
+    fields: Optional[Sequence[str]] = None
+) -> List[Tuple[int, str, str]]:
+    """Filas (anio_lanzamiento, id, json), por defecto ordenadas por año descendente"""
+    query, params = films_query(limit, offset, after, filters, sort, fields)
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur.execute(query, params).fetchall()
+
+
+def fetch_last_modified(conn: sqlite3.Connection) -> Optional[str]:
+    """Última escritura del catálogo (alta o actualización), para Last-Modified"""
+    return conn.execute("SELECT MAX(updated_at) FROM peliculas").fetchone()[0]
+
+
+def fetch_films_page(
+    conn: sqlite3.Connection,
+    limit: Optional[int],
+    offset: Optional[int],
+    after: Optional[Tuple[int, str]],
+    filters: Optional[Dict[str, Any]] = None,
+    sort: str = DEFAULT_SORT,
+    fields: Optional[Sequence[str]] = None
+) -> Tuple[List[Tuple[int, str, str]], Optional[str]]:
+    return fetch_films(conn, limit, offset, after, filters, sort, fields), fetch_last_modified(conn)
+
+
+def fetch_catalog(conn: sqlite3.Connection) -> List[Tuple[int, str, str, str]]:
+    """Catálogo completo (anio_lanzamiento, id, json, updated_at) en el orden de /films"""
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur.execute(f"""
+        SELECT anio_lanzamiento, id, {PELICULA_JSON}, updated_at
+        FROM peliculas
+        ORDER BY anio_lanzamiento DESC, id DESC
+    """).fetchall()
+
+
+def fetch_catalog_rows(conn: sqlite3.Connection, ids: Sequence[str]) -> List[Tuple[int, str, str, str]]:
+    """Filas de fetch_catalog() solo para esos ids (las que no existen se omiten)"""
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur.execute(f"""
+        SELECT anio_lanzamiento, id, {PELICULA_JSON}, updated_at
+        FROM peliculas
+        WHERE id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(list(ids)),)).fetchall()
+
+
+def fetch_stats(conn: sqlite3.Connection) -> dict:
+    """Estadísticas del catálogo leídas de los resúmenes que mantienen los triggers"""
+    def average(total: float, count: int) -> Optional[float]:
+        return round(total / count, 2) if count else None
+
+    cur = conn.cursor()
+    cur.row_factory = None
+    films, rating_sum, rating_n, runtime_sum, runtime_n = cur.execute("""
+        SELECT peliculas, calificacion_suma, calificacion_n, duracion_suma, duracion_n
+        FROM peliculas_stats WHERE clave = 1
+    """).fetchone()
+    directors = cur.execute("""
+        SELECT director, peliculas, calificacion_suma, calificacion_n
+        FROM peliculas_stats_director WHERE peliculas > 0
+        ORDER BY peliculas DESC, director
+    """).fetchall()
+    decades = cur.execute(
+        "SELECT decada, peliculas FROM peliculas_stats_decada WHERE peliculas > 0 ORDER BY decada"
+    ).fetchall()
+    runtimes = cur.execute(
+        "SELECT desde, peliculas FROM peliculas_stats_duracion WHERE peliculas > 0 ORDER BY desde"
+    ).fetchall()
+    return {
+        "films": films,
+        "average_rating": average(rating_sum, rating_n),
+        "average_runtime": average(runtime_sum, runtime_n),
+        "by_director": [
+            {"director": director or None, "films": count, "average_rating": average(total, rated)}
+            for director, count, total, rated in directors
+        ],
+        "by_decade": [{"decade": decade, "films": count} for decade, count in decades],
+        "runtime_distribution": [
+            {"from_minutes": start, "to_minutes": start + RUNTIME_BUCKET - 1, "films": count}
+            for start, count in runtimes
+        ],
+    }
+
+
+def fetch_stats_page(conn: sqlite3.Connection) -> Tuple[dict, Optional[str]]:
+    return fetch_stats(conn), fetch_last_modified(conn)
+
+
+def fetch_film(conn: sqlite3.Connection, film_id: str) -> Optional[Tuple[str, str]]:
+    """(json, updated_at) de una película, o None si no existe"""
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur.execute(f"""
+        SELECT {PELICULA_JSON}, updated_at
+        FROM peliculas
+        WHERE id = ?
+    """, (film_id,)).fetchone()
+
+
+# Ancho en minutos de los tramos de duración de /films/stats (peliculas_stats_duracion)
+RUNTIME_BUCKET = 30
+
+
+# Pesos bm25 por columna: titulo, titulo_original, director, productor, descripcion
+SEARCH_WEIGHTS = "10.0, 8.0, 3.0, 2.0, 1.0"
+
+# El fragmento marca las coincidencias con \x02/\x03 y no con <mark> directamente:
+# el texto de la columna se escapa como HTML antes de poner las etiquetas
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+SEARCH_SNIPPET = f"snippet(peliculas_fts, -1, char({ord(SNIPPET_START)}), char({ord(SNIPPET_END)}), '…', 12)"
+
+
+def highlight_snippet(snippet: str) -> str:
+    """Fragmento seguro para insertar como HTML, con las coincidencias entre <mark>"""
+    return html.escape(snippet).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+def build_match_query(q: str) -> str:
+    """Convertir el texto del usuario en una consulta FTS5 segura (AND de prefijos)"""
+    tokens = re.findall(r'\w+', q)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_films_fts(conn: sqlite3.Connection, match: str, limit: int, highlight: bool) -> List[str]:
+    """Películas en JSON ordenadas por relevancia bm25"""
+    snippet = SEARCH_SNIPPET if highlight else 'NULL'
+    cur = conn.cursor()
+    cur.row_factory = None
+    rows = cur.execute(f"""
+        SELECT {pelicula_json('p')}, {snippet}
+        FROM peliculas_fts
+        JOIN peliculas p ON p.rowid = peliculas_fts.rowid
+        WHERE peliculas_fts MATCH ?
+        ORDER BY bm25(peliculas_fts, {SEARCH_WEIGHTS})
+        LIMIT ?
+    """, (match, limit)).fetchall()
+    if not highlight:
+        return [row[0] for row in rows]
+    # Agregar "snippet" al final del objeto ya serializado
+    return [
+        f'{film[:-1]},"snippet":{json.dumps(highlight_snippet(text), ensure_ascii=False)}}}'
+        for film, text in rows
+    ]
+
+
+def insert_film(conn: sqlite3.Connection, pelicula: Pelicula) -> int:
+    try:
+        cur = conn.execute("""
+            INSERT INTO peliculas (id, titulo, titulo_original, director, productor,
+                                 anio_lanzamiento, duracion, descripcion, imagen_url, calificacion, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (
+            pelicula.id,
+            pelicula.titulo,
+            pelicula.titulo_original,
+            pelicula.director,
+            pelicula.productor,
+            pelicula.anio_lanzamiento,
+            pelicula.duracion,
+            pelicula.descripcion,
+            pelicula.imagen_url,
+            pelicula.calificacion
+        ))
+        conn.commit()
+        return cur.lastrowid
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def count_films(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) as count FROM peliculas").fetchone()['count']
+
+
+def ping(conn: sqlite3.Connection) -> None:
+    """Consulta mínima para comprobar que la base responde"""
+    conn.execute("SELECT 1").fetchone()
@@ -0,0 +1,81 @@
+"""
+Servidor de producción: uvicorn con varios procesos sobre la misma base SQLite.
+
+Cada worker abre su propio pool, caché y snapshot. La base queda en modo WAL
+(lecturas concurrentes entre procesos sin bloquearse), las escrituras toman el
+lock con BEGIN IMMEDIATE y reintentan con backoff, y cada worker se entera de
+las escrituras de los demás con PRAGMA data_version (ver DB_WATCH_SECONDS).
+
+Uso:
+    python serve.py                     # un worker por CPU (o WEB_CONCURRENCY)
+    python serve.py --workers 4 --port 3003
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+import uvicorn
+
+from init_db import upgrade_database
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_workers() -> int:
+    return int(os.getenv('WEB_CONCURRENCY') or os.cpu_count() or 1)
+
+
+def prepare_database(db_file: str) -> None:
+    """Dejar la base en WAL, con índices, búsqueda y resúmenes al día, antes de levantar los workers.
+
+    journal_mode=WAL es persistente en el archivo; hacerlo una sola vez evita que
+    varios workers intenten cambiar el modo a la vez al arrancar.
+    """
+    if not os.path.exists(db_file):
+        sys.exit(f"No existe '{db_file}'; ejecute primero: python init_db.py")
+    conn = sqlite3.connect(db_file, timeout=30)
+    try:
+        mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if mode.lower() != 'wal':
+            sys.exit(f"No se pudo activar WAL en '{db_file}' (modo actual: {mode})")
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'peliculas'"
+        ).fetchone()
+        if not has_table:
+            sys.exit(f"'{db_file}' no tiene la tabla peliculas; ejecute: python init_db.py")
+        # Bases creadas con versiones anteriores de init_db.py
+        upgrade_database(conn)
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '3003')))
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="Procesos de uvicorn (por defecto WEB_CONCURRENCY o el número de CPUs)")
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--no-access-log', action='store_true')
+    args = parser.parse_args()
+
+    db_file = os.path.abspath(os.getenv('DB_FILE', './ghibli.db'))
+    prepare_database(db_file)
+    # Los workers heredan el entorno; con la ruta absoluta no dependen del cwd
+    os.environ['DB_FILE'] = db_file
+
+    print(f"Sirviendo '{db_file}' con {args.workers} worker(s) en http://{args.host}:{args.port}")
+    uvicorn.run(
+        'main:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=API_DIR,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Snapshot del catálogo en memoria: una copia inmutable de peliculas, ya
+serializada, que responde listados y búsquedas por id sin ir a SQLite.
+
+Cada recarga construye un snapshot nuevo y lo publica con una sola
+asignación, así que las lecturas nunca toman locks. Tras las escrituras de la
+API se releen solo las filas escritas y el resto se copia del snapshot
+anterior; cuando cambia la base desde fuera (PRAGMA data_version o mtime del
+archivo) se recarga completo.
+"""
+import asyncio
+import sqlite3
+import sys
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from database import ChangeWatcher, ConnectionPool
+from queries import fetch_catalog, fetch_catalog_rows
+
+# (anio_lanzamiento, id, json, updated_at)
+CatalogRow = Tuple[int, str, str, str]
+
+
+def sort_key(row: CatalogRow) -> Tuple[float, str]:
+    """Clave ascendente de una fila; NULL queda al final del orden descendente"""
+    return (row[0] if row[0] is not None else float('-inf'), row[1])
+
+
+def row_size(row: CatalogRow) -> int:
+    """Bytes aproximados de una fila y su clave de orden"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) + sys.getsizeof((0, ''))
+
+
+class SnapshotTooLarge(Exception):
+    """El catálogo supera el máximo de filas permitido para el snapshot"""
+
+
+class CatalogSnapshot:
+    """Catálogo inmutable: filas en el orden de /films más un índice por id"""
+    __slots__ = ('rows', 'by_id', 'ascending_keys', 'last_modified', 'loaded_at', 'load_seconds', 'memory_bytes')
+
+    def __init__(self, rows: List[CatalogRow], load_seconds: float):
+        self.rows: Tuple[CatalogRow, ...] = tuple(rows)
+        self.by_id: Dict[str, CatalogRow] = {row[1]: row for row in self.rows}
+        # Claves de orden ascendentes para ubicar un cursor con bisect
+        self.ascending_keys: List[Tuple[float, str]] = [sort_key(row) for row in reversed(self.rows)]
+        self.last_modified: Optional[str] = max((row[3] for row in self.rows if row[3]), default=None)
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.memory_bytes = self._estimate_memory()
+
+    def _estimate_memory(self) -> int:
+        size = sys.getsizeof(self.rows) + sys.getsizeof(self.by_id) + sys.getsizeof(self.ascending_keys)
+        return size + sum(row_size(row) for row in self.rows)
+
+    def updated(self, ids: List[str], fresh: List[CatalogRow], load_seconds: float) -> 'CatalogSnapshot':
+        """Snapshot nuevo con las filas de `ids` reemplazadas por `fresh`.
+
+        Copia las estructuras del actual y mueve solo esas filas con bisect, sin
+        volver a construir el índice ni la clave de cada fila del catálogo.
+        """
+        rows = list(self.rows)
+        keys = list(self.ascending_keys)
+        by_id = dict(self.by_id)
+        memory_bytes = self.memory_bytes
+        # keys es rows al revés: keys[i] corresponde a rows[len(rows) - 1 - i]
+        for film_id in ids:
+            old = by_id.pop(film_id, None)
+            if old is not None:
+                position = bisect_left(keys, sort_key(old))
+                del keys[position]
+                del rows[len(rows) - 1 - position]
+                memory_bytes -= row_size(old)
+        for row in fresh:
+            key = sort_key(row)
+            position = bisect_left(keys, key)
+            rows.insert(len(rows) - position, row)
+            keys.insert(position, key)
+            by_id[row[1]] = row
+            memory_bytes += row_size(row)
+
+        snapshot = CatalogSnapshot.__new__(CatalogSnapshot)
+        snapshot.rows = tuple(rows)
+        snapshot.by_id = by_id
+        snapshot.ascending_keys = keys
+        # Sin DELETE en la API, la última escritura solo puede avanzar
+        snapshot.last_modified = max(
+            [value for value in [self.last_modified] + [row[3] for row in fresh] if value], default=None
+        )
+        snapshot.loaded_at = time.time()
+        snapshot.load_seconds = load_seconds
+        snapshot.memory_bytes = memory_bytes
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, film_id: str) -> Optional[CatalogRow]:
+        return self.by_id.get(film_id)
+
+    def page(
+        self,
+        limit: Optional[int],
+        offset: Optional[int] = None,
+        after: Optional[Tuple[int, str]] = None
+    ) -> List[CatalogRow]:
+        """Mismo resultado que queries.fetch_films, resuelto en memoria"""
+        start = 0
+        if after:
+            # Las filas con clave < after son las últimas `smaller` del orden descendente
+            smaller = bisect_left(self.ascending_keys, after)
+            start = len(self.rows) - smaller
+        start += offset or 0
+        end = start + limit if limit else len(self.rows)
+        return list(self.rows[start:end])
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self.rows),
+            "memory_bytes": self.memory_bytes,
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.loaded_at)),
+            "load_ms": round(self.load_seconds * 1000, 3),
+        }
+
+
+class SnapshotManager:
+    """Carga, publica y mantiene al día el snapshot del catálogo"""
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_rows: int = 200000,
+        poll_interval: float = 1.0,
+        max_updated_rows: int = 1000
+    ):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.poll_interval = poll_interval
+        # Con más filas escritas que esto conviene recargar el catálogo completo
+        self.max_updated_rows = max_updated_rows
+        self.current: Optional[CatalogSnapshot] = None
+        self.reloads = 0
+        self.updates = 0
+        self.external_changes = 0
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        # Recargas pedidas / cubiertas: varias escrituras seguidas comparten una recarga
+        self._requested = 0
+        self._completed = 0
+        self.watcher = ChangeWatcher(pool.db_file)
+        self._signature: Optional[Tuple[int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners = []
+
+    def on_change(self, callback) -> None:
+        """Registrar una función a llamar cada vez que se publica un snapshot nuevo"""
+        self._listeners.append(callback)
+
+    def _load(self, conn: sqlite3.Connection) -> CatalogSnapshot:
+        count = conn.execute("SELECT COUNT(*) FROM peliculas").fetchone()[0]
+        if count > self.max_rows:
+            raise SnapshotTooLarge(f"{count} películas superan SNAPSHOT_MAX_ROWS={self.max_rows}")
+        start = time.perf_counter()
+        rows = fetch_catalog(conn)
+        return CatalogSnapshot(rows, time.perf_counter() - start)
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Recargar desde SQLite y publicar el snapshot nuevo de forma atómica"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        self._requested += 1
+        target = self._requested
+        async with self._refresh_lock:
+            if self._completed >= target:
+                # Otra recarga iniciada después de este pedido ya lo cubrió
+                return self.current
+            covered = self._requested
+            # La firma se toma antes de leer: un cambio concurrente provoca otra recarga
+            self._signature = await run_in_threadpool(self.watcher.signature)
+            snapshot = await self.pool.run(self._load)
+            self.current = snapshot
+            self._completed = covered
+            self.reloads += 1
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+
+    async def update(self, ids: Optional[List[str]]) -> CatalogSnapshot:
+        """Publicar un snapshot con las filas de `ids` releídas de SQLite.
+
+        Con ids None (no se sabe qué filas cambiaron) o demasiados ids hace una
+        recarga completa. La firma de la base no se actualiza: una escritura de
+        otro proceso confirmada a la vez que la de esta instancia no se pierde,
+        el observador la ve y recarga completo en segundo plano.
+        """
+        if ids is not None:
+            ids = list(dict.fromkeys(ids))
+        if self.current is None or ids is None or len(ids) > self.max_updated_rows:
+            return await self.refresh()
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        # Bajo el mismo lock que refresh(): una recarga que empezó antes de la
+        # escritura se publica primero y estas filas se aplican encima
+        async with self._refresh_lock:
+            start = time.perf_counter()
+            fresh = await self.pool.run(fetch_catalog_rows, ids)
+            snapshot = self.current.updated(ids, fresh, time.perf_counter() - start)
+            self.current = snapshot
+            self.updates += 1
+        for callback in self._listeners:
+            callback(snapshot)
+        return snapshot
+
+    async def check_for_changes(self) -> bool:
+        """Recargar si la base cambió por fuera de esta instancia"""
+        signature = await run_in_threadpool(self.watcher.signature)
+        if signature == self._signature:
+            return False
+        self.external_changes += 1
+        await self.refresh()
+        return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.check_for_changes()
+            except Exception as e:
+                print(f"Error al actualizar el snapshot del catálogo: {e}")
+
+    async def start(self) -> None:
+        await self.refresh()
+        if self.poll_interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.watcher.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True,
+            "max_rows": self.max_rows,
+            "reloads": self.reloads,
+            "updates": self.updates,
+            "external_changes": self.external_changes,
+            **(self.current.stats() if self.current else {}),
+        }